@@ -1,12 +1,15 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from passlib.context import CryptContext
-from app.database import get_db
+from app.database import get_db, run_db
 from app.models.user import User
+from app.auth.principal_cache import Principal, principal_cache
+from app.auth.password_pool import password_pool
+from app.services.metrics import timed
 
 # Secret key should be stored in environment variable in production
 SECRET_KEY = "your-secret-key-change-in-production"
@@ -22,6 +25,16 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password, hashed_password):
+    """Verify a password on the password pool instead of the event loop"""
+    with timed("bcrypt"):
+        return await password_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    """Hash a password on the password pool instead of the event loop"""
+    with timed("bcrypt"):
+        return await password_pool.run(get_password_hash, password)
+
 def authenticate_user(db: Session, username: str, password: str):
     user = db.query(User).filter(User.username == username).first()
     if not user:
@@ -30,6 +43,14 @@ def authenticate_user(db: Session, username: str, password: str):
         return False
     return user
 
+async def authenticate_user_async(db: Session, username: str, password: str):
+    user = await run_db(db.query(User).filter(User.username == username).first)
+    if not user:
+        return False
+    if not await verify_password_async(password, user.hashed_password):
+        return False
+    return user
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -40,23 +61,37 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def decode_token_subject(token: str) -> Optional[str]:
+    """Verify a JWT and return its subject, or None if the token is invalid"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+def get_current_user(request: Request, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
+    username = decode_token_subject(token)
+    if username is None:
         raise credentials_exception
-    return user
+
+    # Identify the caller from the cache when possible
+    principal = principal_cache.get(username)
+    if principal is None:
+        user = db.query(User).filter(User.username == username).first()
+        if user is None:
+            raise credentials_exception
+        principal = Principal(id=user.id, username=user.username, email=user.email)
+        principal_cache.set(username, principal)
+
+    # Share the resolved principal with the audit middleware for this request
+    request.state.user_id = principal.id
+    request.state.username = principal.username
+    return principal
 
 # Add this function to help debug token issues
 def debug_token(token: str) -> dict:
@@ -0,0 +1,40 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
+
+PASSWORD_POOL_WORKERS = int(os.environ.get("PASSWORD_POOL_WORKERS", "2"))
+PASSWORD_POOL_MAX_PENDING = int(os.environ.get("PASSWORD_POOL_MAX_PENDING", "32"))
+
+
+class PasswordPool:
+    """
+    Runs bcrypt work on a small dedicated thread pool so hashing never blocks
+    the event loop. Calls beyond `max_pending` (running plus queued) are
+    rejected with a 503 instead of piling up.
+    """
+
+    def __init__(self, workers: int = PASSWORD_POOL_WORKERS, max_pending: int = PASSWORD_POOL_MAX_PENDING):
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password")
+
+    async def run(self, func: Callable, *args) -> Any:
+        # Only touched from the event loop thread, so no lock is needed
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+
+password_pool = PasswordPool()
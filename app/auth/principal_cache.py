@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+PRINCIPAL_CACHE_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", "1024"))
+PRINCIPAL_CACHE_TTL = float(os.environ.get("PRINCIPAL_CACHE_TTL", "60"))
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated caller: public user columns, detached from any session"""
+    id: int
+    username: str
+    email: Optional[str] = None
+
+
+class PrincipalCache:
+    """
+    Bounded LRU cache of resolved users keyed by the token subject (username).
+    Entries expire after `ttl` seconds. Values are immutable Principal objects
+    rather than ORM instances so they never outlive the session that loaded them.
+    """
+
+    def __init__(self, maxsize: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # get_current_user runs in the threadpool, so guard the dict
+        self._lock = threading.Lock()
+
+    def get(self, username: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, values = entry
+            if expires_at <= time.monotonic():
+                del self._entries[username]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return values
+
+    def set(self, username: str, values: Principal):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[username] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: str):
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+principal_cache = PrincipalCache()
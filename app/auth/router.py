@@ -2,11 +2,13 @@ from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
-from app.database import get_db
-from app.auth.jwt import authenticate_user, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, get_password_hash
+from app.database import get_db, run_db
+from app.auth.jwt import authenticate_user_async, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, get_password_hash_async
 from app.schemas.user import Token, UserCreate, User as UserSchema
 from app.models.user import User
 from app.services.audit_service import AuditService
+from app.auth.principal_cache import principal_cache
+from app.services.cache_bus import cache_bus
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
@@ -17,7 +19,7 @@ async def login_for_access_token(
     db: Session = Depends(get_db),
     audit_service: AuditService = Depends()
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         # Log failed login attempt
         await audit_service.log_event(
@@ -56,7 +58,7 @@ async def register_user(
     audit_service: AuditService = Depends()
 ):
     # Check if username already exists
-    db_user = db.query(User).filter(User.username == user_data.username).first()
+    db_user = await run_db(db.query(User).filter(User.username == user_data.username).first)
     if db_user:
         await audit_service.log_event(
             action="register_failed",
@@ -71,7 +73,7 @@ async def register_user(
         )
     
     # Check if email already exists
-    db_user = db.query(User).filter(User.email == user_data.email).first()
+    db_user = await run_db(db.query(User).filter(User.email == user_data.email).first)
     if db_user:
         await audit_service.log_event(
             action="register_failed",
@@ -86,7 +88,7 @@ async def register_user(
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     new_user = User(
         username=user_data.username,
         email=user_data.email,
@@ -94,8 +96,12 @@ async def register_user(
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await run_db(db.commit)
+    await run_db(db.refresh, new_user)
+
+    # Drop any stale cache entry left by an earlier user with this name
+    principal_cache.invalidate(new_user.username)
+    await cache_bus.publish("principal", new_user.username)
     
     # Log successful registration
     await audit_service.log_event(
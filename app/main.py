@@ -1,24 +1,45 @@
-from fastapi import FastAPI, Depends, Request
+import asyncio
+from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from app.database import engine, Base, get_db
+from app.database import engine
 from app.auth.router import router as auth_router
 from app.routers.diagnostics import router as diagnostics_router
-from app.routers.admin import router as admin_router  # Add this import
-from app.middleware.audit_middleware import AuditMiddleware  # Add this import
-from app.models.user import User
-from app.auth.jwt import get_password_hash
-from app.database import TEST_MODE
+from app.routers.admin import router as admin_router
+from app.middleware.audit_middleware import AuditMiddleware
+from app.database import TEST_MODE, SQLITE_MAINTENANCE_INTERVAL, run_db, sqlite_maintenance_loop
+from app.services.audit_writer import audit_writer, AUDIT_WRITE_MODE
+from app.services.scoring import scoring_engine
+from app.services.cache_bus import cache_bus
+from app.services.audit_partitions import AUDIT_PARTITION_INTERVAL, audit_partition_loop
+from app.auth.principal_cache import principal_cache
+from app.services.bootstrap import create_default_admin, initialize_database
+from app.services.metrics import METRICS_ENABLED, instrument_engine
+from app.middleware.metrics_middleware import MetricsMiddleware
+from app.routers.metrics import router as metrics_router
+from app.services.query_monitor import QUERY_MONITOR_ENABLED, monitor_engine
+from app.middleware.query_monitor_middleware import QueryMonitorMiddleware
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Create tables and indexes; serialized across worker processes
+initialize_database(engine)
 
 app = FastAPI(title="WomSoft Server")
 
 # Add audit middleware
 app.add_middleware(AuditMiddleware)  # Add this line
 
+# Slow-query log and N+1 detection
+if QUERY_MONITOR_ENABLED:
+    monitor_engine(engine)
+    app.add_middleware(QueryMonitorMiddleware)
+
+# Request timing, Server-Timing headers and /metrics; added last so it is the
+# outermost middleware and its timings include auditing
+if METRICS_ENABLED:
+    instrument_engine(engine)
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -54,13 +75,68 @@ async def admin_audit(request: Request):
 # Create initial admin user if none exists
 @app.on_event("startup")
 async def startup_event():
-    db = next(get_db())
-    user_count = db.query(User).count()
-    if user_count == 0 and not TEST_MODE:
-        admin_user = User(
-            username="admin",
-            email="admin@mimark.es",
-            hashed_password=get_password_hash("admin")
+    # Every worker runs this; the lock makes sure only one admin is created
+    if not TEST_MODE:
+        await run_db(create_default_admin, engine)
+
+# Start the background audit writer
+@app.on_event("startup")
+async def start_audit_writer():
+    if AUDIT_WRITE_MODE == "batched":
+        await audit_writer.start()
+
+# Flush pending audit events before the process exits
+@app.on_event("shutdown")
+async def stop_audit_writer():
+    await audit_writer.stop()
+
+# Load the scoring model once instead of on the first request
+@app.on_event("startup")
+async def load_scoring_model():
+    scoring_engine.load()
+
+# Apply cache invalidations published by other worker processes
+def invalidate_principal(username):
+    if username:
+        principal_cache.invalidate(username)
+    else:
+        principal_cache.clear()
+
+cache_bus.subscribe("principal", invalidate_principal)
+cache_bus.subscribe("scoring", lambda key: scoring_engine.reload())
+
+@app.on_event("startup")
+async def start_cache_bus():
+    await cache_bus.start()
+
+@app.on_event("shutdown")
+async def stop_cache_bus():
+    await cache_bus.stop()
+
+# Move closed months of audit_logs into their monthly partitions
+@app.on_event("startup")
+async def start_audit_partitioning():
+    app.state.partition_task = None
+    if AUDIT_PARTITION_INTERVAL > 0:
+        app.state.partition_task = asyncio.create_task(
+            audit_partition_loop(engine, AUDIT_PARTITION_INTERVAL)
         )
-        db.add(admin_user)
-        db.commit()
\ No newline at end of file
+
+@app.on_event("shutdown")
+async def stop_audit_partitioning():
+    if app.state.partition_task is not None:
+        app.state.partition_task.cancel()
+
+# Periodically checkpoint the WAL and refresh SQLite statistics
+@app.on_event("startup")
+async def start_sqlite_maintenance():
+    app.state.maintenance_task = None
+    if SQLITE_MAINTENANCE_INTERVAL > 0 and engine.dialect.name == "sqlite":
+        app.state.maintenance_task = asyncio.create_task(
+            sqlite_maintenance_loop(engine, SQLITE_MAINTENANCE_INTERVAL)
+        )
+
+@app.on_event("shutdown")
+async def stop_sqlite_maintenance():
+    if app.state.maintenance_task is not None:
+        app.state.maintenance_task.cancel()
@@ -1,113 +1,153 @@
-import json
+import logging
 import os
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+import random
+import time
+from typing import Optional
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.database import SessionLocal
 from app.services.audit_service import AuditService
-from app.auth.jwt import get_current_user, jwt
-from app.models.user import User  # Add this import
+from app.auth.jwt import decode_token_subject
+
+logger = logging.getLogger(__name__)
+
+# Skip audit for certain endpoints that are already audited elsewhere
+SKIP_PATHS = {
+    "/api/auth/login",
+    "/api/auth/register",
+    "/api/diagnostics",
+    # Batch and export endpoints write their own aggregated event
+    "/api/diagnostics/batch",
+    "/api/diagnostics/upload",
+    "/api/diagnostics/export"
+}
+
+def _parse_sample_rates(raw: str) -> dict:
+    rates = {}
+    for entry in raw.split(","):
+        if "=" in entry:
+            route, rate = entry.split("=", 1)
+            rates[route.strip()] = float(rate)
+    return rates
+
+# Fraction of successful reads to record per route template, e.g.
+# "/api/admin/check-access=0.1,/api/diagnostics/=0.5". Writes and failed
+# requests are always recorded. Routes not listed are always recorded.
+ROUTE_SAMPLE_RATES = _parse_sample_rates(
+    os.environ.get("AUDIT_ROUTE_SAMPLE_RATES", "/api/admin/check-access=0.1")
+)
+
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+def sample_rate_for(method: str, route: Optional[str], status_code: int) -> float:
+    """Return the probability with which this request should be audited"""
+    if method not in READ_METHODS or status_code >= 400:
+        return 1.0
+    return ROUTE_SAMPLE_RATES.get(route, 1.0)
+
+class AuditMiddleware:
+    """
+    Pure ASGI middleware that records API access in the audit log.
+
+    The status code is taken from the http.response.start message and the
+    response body is passed straight through, so streaming responses are not
+    buffered. The audit event is written after the response has been sent.
+    """
 
-class AuditMiddleware(BaseHTTPMiddleware):
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
-        
-    async def dispatch(self, request: Request, call_next):
-        # Print debugging info in test environment 
-        if "PYTEST_CURRENT_TEST" in os.environ:
-            print(f"Audit middleware processing request to: {request.url.path}")
-        
-        # Process the request first
-        response = await call_next(request)
-        
-        # Skip audit for non-API routes or static files
-        path = request.url.path
-        if not path.startswith("/api/"):
-            return response
-            
-        # Skip audit for certain endpoints that are already audited elsewhere
-        skip_paths = [
-            "/api/auth/login",
-            "/api/auth/register",
-            "/api/diagnostics"
-        ]
-        if path in skip_paths:
-            return response
-        
-        # Try to extract user ID from token
-        user_id = None
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # Static files, HTML pages and non-HTTP traffic pass straight through
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
         try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if scope["path"] not in SKIP_PATHS:
+                latency_ms = (time.perf_counter() - start_time) * 1000
+                await self._audit(scope, status_code, latency_ms)
+
+    async def _audit(self, scope: Scope, status_code: int, latency_ms: float):
+        request = Request(scope)
+        path = request.url.path
+        method = request.method
+
+        # Route template as matched by the router, e.g. /api/diagnostics/{diagnostic_id}
+        route = scope.get("route")
+        route_path = getattr(route, "path", None)
+
+        rate = sample_rate_for(method, route_path, status_code)
+        if rate < 1.0 and random.random() >= rate:
+            return
+
+        # Use the principal resolved by get_current_user for this request
+        state = scope.get("state", {})
+        user_id = state.get("user_id")
+        username = state.get("username")
+
+        # Endpoints without the auth dependency: verify the token here, but
+        # don't look the user up
+        if username is None:
             auth_header = request.headers.get("Authorization", "")
             if auth_header.startswith("Bearer "):
-                token = auth_header.replace("Bearer ", "")
-                payload = jwt.decode(token, "your-secret-key-change-in-production", algorithms=["HS256"])
-                username = payload.get("sub")
-                
-                # Get user from database
-                db = SessionLocal()
-                try:
-                    user = db.query(User).filter(User.username == username).first()
-                    if user:
-                        user_id = user.id
-                finally:
-                    db.close()
-        except Exception:
-            # If token extraction fails, continue without user ID
-            pass
-            
+                username = decode_token_subject(auth_header[len("Bearer "):])
+
         # Log API access
+        db = SessionLocal()
         try:
-            db = SessionLocal()
             audit_service = AuditService(db)
-            
-            # Extract relevant information for audit
-            method = request.method
-            query_params = dict(request.query_params)
-            
-            # Extract path parameters
-            path_params = {}
-            for segment in path.split("/"):
-                if segment and segment.isdigit():
-                    path_params["id"] = segment
-            
-            # Determine entity type from path
-            parts = [p for p in path.split("/") if p]
+
+            # Determine entity type from the route template (or the raw path
+            # if no route matched), skipping path parameters
+            parts = [
+                p for p in (route_path or path).split("/")
+                if p and not p.startswith("{") and not p.isdigit()
+            ]
             entity_type = parts[-1] if len(parts) > 0 else "unknown"
-            
+
             # Generate action based on method and path
             action = f"{method.lower()}_{entity_type}"
-            
+
+            path_params = scope.get("path_params", {})
+            entity_id = next(iter(path_params.values()), None)
+
+            # One enriched event per request
+            details = {
+                "method": method,
+                "path": path,
+                "route": route_path,
+                "query_params": dict(request.query_params),
+                "path_params": path_params,
+                "status_code": status_code,
+                "latency_ms": round(latency_ms, 2),
+                "username": username
+            }
+            if rate < 1.0:
+                details["sample_rate"] = rate
+
             await audit_service.log_event(
                 action=action,
                 entity_type=entity_type,
+                entity_id=str(entity_id) if entity_id is not None else None,
                 user_id=user_id,
-                details={
-                    "method": method,
-                    "path": path,
-                    "query_params": query_params,
-                    "path_params": path_params,
-                    "status_code": response.status_code
-                },
+                details=details,
                 request=request
             )
-            
-            # Ensure middleware calls service even in tests
-            try:
-                await audit_service.log_event(
-                    action="api_access",
-                    entity_type="endpoint",
-                    entity_id=request.url.path,
-                    user_id=user.id if user else None,
-                    request=request
-                )
-            except Exception as e:
-                print(f"Error logging audit event: {e}")
-                
-        except Exception as e:
+        except Exception:
             # Log error but don't interrupt response
-            print(f"Audit logging error: {str(e)}")
+            logger.exception("Audit logging failed")
         finally:
             db.close()
-            
-        return response
\ No newline at end of file
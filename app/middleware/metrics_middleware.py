@@ -0,0 +1,41 @@
+import time
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.metrics import end_request, metrics_registry, server_timing, start_request
+
+class MetricsMiddleware:
+    """
+    Time every HTTP request, add a Server-Timing header and record the
+    timings per route template. Only installed when METRICS_ENABLED is set.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings, token = start_request()
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing(time.perf_counter() - start_time, timings))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_request(token)
+            # Label by route template so ids in paths don't create new series
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            metrics_registry.observe(
+                scope["method"], route, status_code, time.perf_counter() - start_time, timings
+            )
@@ -0,0 +1,28 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.services.query_monitor import N_PLUS_ONE_THRESHOLD, end_request, report_repeats, start_request
+
+class QueryMonitorMiddleware:
+    """
+    Attribute SQL statements to the HTTP request that ran them, for the
+    slow-query log, and report statements repeated N_PLUS_ONE_THRESHOLD
+    times once the request is done. Only installed when the query monitor
+    is enabled.
+    """
+
+    def __init__(self, app: ASGIApp, threshold: int = N_PLUS_ONE_THRESHOLD):
+        self.app = app
+        self.threshold = threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = start_request(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            end_request(request)
+            if self.threshold:
+                report_repeats(request, self.threshold)
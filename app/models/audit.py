@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
-from app.database import Base
+from app.database import Base, UTCDateTime
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
@@ -12,10 +13,21 @@ class AuditLog(Base):
     action = Column(String, nullable=False)  # e.g., "login", "create_diagnostic", "view_patient"
     entity_type = Column(String, nullable=False)  # e.g., "user", "patient", "diagnostic"
     entity_id = Column(String, nullable=True)  # ID of the affected entity
-    timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # The Python-side default keeps the stored format identical for ORM and
+    # bulk inserts, which keyset pagination on (timestamp, id) relies on
+    timestamp = Column(UTCDateTime(timezone=True), default=datetime.utcnow, server_default=func.now(), nullable=False)
     details = Column(Text, nullable=True)  # JSON-encoded additional details
     ip_address = Column(String, nullable=True)
     user_agent = Column(String, nullable=True)
 
     # Relationship to user (optional)
-    user = relationship("User", back_populates="audit_logs")
\ No newline at end of file
+    user = relationship("User", back_populates="audit_logs")
+
+    # Match the filter shapes used by the admin audit log browser; every index
+    # ends in timestamp so results come out in timestamp order
+    __table_args__ = (
+        Index("ix_audit_logs_timestamp_id", "timestamp", "id"),
+        Index("ix_audit_logs_user_id_timestamp", "user_id", "timestamp"),
+        Index("ix_audit_logs_action_timestamp", "action", "timestamp"),
+        Index("ix_audit_logs_entity_timestamp", "entity_type", "entity_id", "timestamp"),
+    )
\ No newline at end of file
@@ -0,0 +1,13 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, String
+
+from app.database import Base
+
+class CacheInvalidation(Base):
+    """Invalidation messages read by every worker process; see app/services/cache_bus.py"""
+    __tablename__ = "cache_invalidations"
+
+    id = Column(Integer, primary_key=True)
+    cache = Column(String, nullable=False)
+    key = Column(String, nullable=True)  # None invalidates the whole cache
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
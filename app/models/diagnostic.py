@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
-from app.database import Base
+from app.database import Base, UTCDateTime
 
 class Diagnostic(Base):
     __tablename__ = "diagnostics"
@@ -13,6 +13,11 @@ class Diagnostic(Base):
     protein2 = Column(Float)  # Changed from timp2
     protein3 = Column(Float)  # Changed from mmp9
     result = Column(String, default="Positive")
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(UTCDateTime, default=datetime.utcnow)
 
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+    __table_args__ = (
+        # Per-user listing and keyset pagination on (user_id, id)
+        Index("ix_diagnostics_user_id_id", "user_id", "id"),
+    )
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, Text
+
+from app.database import Base
+
+class AppSetting(Base):
+    """Key/value store for job state; scripts/backup_audit_logs.py shares this table"""
+    __tablename__ = "app_settings"
+
+    key = Column(String, primary_key=True)
+    value = Column(Text, nullable=True)
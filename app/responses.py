@@ -0,0 +1,29 @@
+import os
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+# Build list responses from row tuples and encode them with orjson instead of
+# validating ORM objects through the Pydantic response models
+FAST_SERIALIZATION = os.environ.get("FAST_SERIALIZATION", "false").lower() == "true"
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse encoded with orjson when it is installed.
+
+    The content must already be plain dicts, lists and scalars (datetimes are
+    fine); nothing is validated against a response model.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return super().render(jsonable_encoder(content))
+
@@ -1,13 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from pydantic import BaseModel
+from sqlalchemy import func, null, select, tuple_
+from collections import OrderedDict
+from itertools import islice
+import json
+import os
+import threading
+import time
 
-from app.database import get_db
+from app.database import get_db, run_db
+from app.responses import FAST_SERIALIZATION, FastJSONResponse
 from app.auth.jwt import get_current_user
+from app.auth.principal_cache import Principal
 from app.models.user import User
 from app.models.audit import AuditLog
+from app.services.audit_service import AuditService
+from app.services.scoring import scoring_engine
+from app.services.cache_bus import cache_bus
+from app.services.rescore import rescore_job
+from app.services.audit_partitions import audit_log_entity
 
 # Define response models
 class AuditLogResponse(BaseModel):
@@ -20,6 +35,8 @@ class AuditLogResponse(BaseModel):
     details: Optional[str]
     ip_address: Optional[str]
     user_agent: Optional[str]
+    # Only filled in with include_user=true
+    username: Optional[str] = None
     
     class Config:
         orm_mode = True
@@ -30,11 +47,61 @@ class PaginatedAuditLogs(BaseModel):
     page: int
     limit: int
     pages: int
+    # Pass as `after` to fetch the next page with keyset pagination
+    next_cursor: Optional[str] = None
+    # True when the count stopped at AUDIT_COUNT_LIMIT, i.e. "total+" records
+    total_capped: bool = False
+
+# Counting stops here unless exact_total=true is requested
+AUDIT_COUNT_LIMIT = int(os.environ.get("AUDIT_COUNT_LIMIT", "10000"))
+# Seconds an exact count is reused for the same filters
+AUDIT_COUNT_CACHE_TTL = float(os.environ.get("AUDIT_COUNT_CACHE_TTL", "30"))
+AUDIT_COUNT_CACHE_SIZE = 256
+
+# filters -> (expires_at, total); counts run in the threadpool, so guard the dict
+_exact_count_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_exact_count_lock = threading.Lock()
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
+def encode_cursor(log: AuditLog) -> str:
+    """Build the keyset cursor pointing just past this log entry"""
+    return f"{log.timestamp.isoformat()},{log.id}"
+
+def decode_cursor(cursor: str):
+    try:
+        timestamp, log_id = cursor.rsplit(",", 1)
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor, expected '<timestamp>,<id>'"
+        )
+
+def bounded_count(db: Session, query, limit: int, entity=AuditLog) -> int:
+    """Count matching rows, but stop scanning after limit + 1 of them"""
+    subquery = query.with_entities(entity.id).limit(limit + 1).subquery()
+    return db.execute(select(func.count()).select_from(subquery)).scalar()
+
+def cached_exact_count(query, cache_key: tuple) -> int:
+    """Full COUNT(*), reused for AUDIT_COUNT_CACHE_TTL seconds per filter set"""
+    now = time.monotonic()
+    with _exact_count_lock:
+        entry = _exact_count_cache.get(cache_key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+    # Count outside the lock so one slow count doesn't block other filters
+    total = query.count()
+    with _exact_count_lock:
+        _exact_count_cache[cache_key] = (now + AUDIT_COUNT_CACHE_TTL, total)
+        _exact_count_cache.move_to_end(cache_key)
+        while len(_exact_count_cache) > AUDIT_COUNT_CACHE_SIZE:
+            _exact_count_cache.popitem(last=False)
+    return total
+
 # Helper function to check if user is admin
-async def is_admin(user: User = Depends(get_current_user)) -> User:
+async def is_admin(user: Principal = Depends(get_current_user)) -> Principal:
     # This is a placeholder - implement proper admin check based on your user roles
     # For now, we're assuming user with ID 1 is the admin
     if user.id != 1:
@@ -54,57 +121,181 @@ async def get_audit_logs(
     end_date: Optional[datetime] = Query(None, description="Default is current time if start_date is provided"),
     page: int = Query(1, ge=1),
     limit: int = Query(50, ge=1, le=100),
-    current_user: User = Depends(is_admin),
+    after: Optional[str] = Query(None, description="Keyset cursor '<timestamp>,<id>' from next_cursor; replaces OFFSET paging"),
+    exact_total: bool = Query(False, description="Count every matching row instead of stopping at AUDIT_COUNT_LIMIT"),
+    include_user: bool = Query(False, description="Add the username of each entry, loaded in the same query"),
+    current_user: Principal = Depends(is_admin),
     db: Session = Depends(get_db)
 ):
-    """Get audit logs with optional filtering"""
+    """
+    Get audit logs with optional filtering
+
+    Without `after` the page is fetched with OFFSET. With `after` the page
+    starts right after the cursor, which costs the same at any depth; `page`
+    is then only echoed back for display.
+
+    The total is counted up to AUDIT_COUNT_LIMIT rows and flagged with
+    total_capped beyond that; pass exact_total=true for a full (cached) count.
+    """
     
+    # Cache exact counts by the filters as given, not the defaulted end_date
+    cache_key = (user_id, action, entity_type, entity_id, start_date, end_date)
+
     # Set default end_date to now if start_date is provided but end_date isn't
     if start_date and not end_date:
         end_date = datetime.now()
         
-    # Build query
-    query = db.query(AuditLog)
+    # Rows before a cursor can't be in later months, so it bounds the range too
+    cursor = decode_cursor(after) if after else None
+
+    # Build query over audit_logs and the monthly partitions in range
+    entity = await run_db(audit_log_entity, db, start_date, cursor[0] if cursor else end_date)
+    query = db.query(entity)
     
     # Apply filters
     if user_id:
-        query = query.filter(AuditLog.user_id == user_id)
+        query = query.filter(entity.user_id == user_id)
     if action:
-        query = query.filter(AuditLog.action == action)
+        query = query.filter(entity.action == action)
     if entity_type:
-        query = query.filter(AuditLog.entity_type == entity_type)
+        query = query.filter(entity.entity_type == entity_type)
     if entity_id:
-        query = query.filter(AuditLog.entity_id == entity_id)
+        query = query.filter(entity.entity_id == entity_id)
     if start_date:
-        query = query.filter(AuditLog.timestamp >= start_date)
+        query = query.filter(entity.timestamp >= start_date)
     if end_date:
-        query = query.filter(AuditLog.timestamp <= end_date)
+        query = query.filter(entity.timestamp <= end_date)
         
-    # Order by timestamp descending (newest first)
-    query = query.order_by(AuditLog.timestamp.desc())
-    
     # Get total count for pagination
-    total = query.count()
+    total_capped = False
+    if exact_total:
+        total = await run_db(cached_exact_count, query, cache_key)
+    else:
+        total = await run_db(bounded_count, db, query, AUDIT_COUNT_LIMIT, entity)
+        if total > AUDIT_COUNT_LIMIT:
+            total = AUDIT_COUNT_LIMIT
+            total_capped = True
+    
+    # The fast path reads plain row tuples instead of ORM objects.
+    # Usernames are eager-loaded so rendering them doesn't lazy-load per row
+    if FAST_SERIALIZATION:
+        if include_user:
+            query = query.outerjoin(entity.user)
+        username = User.username if include_user else null().label("username")
+        query = query.with_entities(*(getattr(entity, column.name) for column in AuditLog.__table__.columns), username)
+    elif include_user:
+        query = query.options(joinedload(entity.user))
+
+    # Order by timestamp descending (newest first), id breaks ties
+    query = query.order_by(entity.timestamp.desc(), entity.id.desc())
     
     # Apply pagination
-    query = query.offset((page - 1) * limit).limit(limit)
+    if cursor:
+        query = query.filter(tuple_(entity.timestamp, entity.id) < cursor)
+    else:
+        query = query.offset((page - 1) * limit)
+    query = query.limit(limit)
     
     # Get results
-    logs = query.all()
+    logs = await run_db(query.all)
+    next_cursor = encode_cursor(logs[-1]) if len(logs) == limit else None
+    if include_user and not FAST_SERIALIZATION:
+        logs = [
+            dict(AuditLogResponse.from_orm(log).dict(), username=log.user.username if log.user else None)
+            for log in logs
+        ]
     
     # Calculate total pages
     pages = (total + limit - 1) // limit if limit > 0 else 0
     
     # Return with pagination info
-    return {
-        "items": logs,
+    result = {
+        "items": [row._asdict() for row in logs] if FAST_SERIALIZATION else logs,
         "total": total,
         "page": page,
         "limit": limit,
-        "pages": pages
+        "pages": pages,
+        "next_cursor": next_cursor,
+        "total_capped": total_capped
     }
+    if FAST_SERIALIZATION:
+        # Already plain values, so skip validation against PaginatedAuditLogs
+        return FastJSONResponse(content=result)
+    return result
+
+@router.get("/audit-logs/search")
+async def search_audit_logs(
+    user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    include_archived: bool = Query(True, description="Also search the columnar audit archive"),
+    limit: int = Query(1000, ge=1, le=1000000),
+    current_user: Principal = Depends(is_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream audit logs from the live table and, optionally, the archive as
+    newline-delimited JSON, newest first. Rows are produced lazily, so the
+    response starts before the whole result has been read.
+    """
+    rows = AuditService(db).iter_logs(
+        action=action,
+        entity_type=entity_type,
+        entity_id=entity_id,
+        user_id=user_id,
+        start_date=start_date,
+        end_date=end_date,
+        include_archived=include_archived,
+    )
+
+    def generate():
+        # Send rows in small batches; each iteration runs in the threadpool
+        lines = []
+        for row in islice(rows, limit):
+            row["timestamp"] = row["timestamp"].isoformat()
+            lines.append(json.dumps(row))
+            if len(lines) == 100:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 
 @router.get("/check-access")
-async def check_admin_access(current_user: User = Depends(is_admin)):
+async def check_admin_access(current_user: Principal = Depends(is_admin)):
     """Endpoint to check if user has admin access"""
-    return {"is_admin": True}
\ No newline at end of file
+    return {"is_admin": True}
+
+@router.post("/scoring/reload")
+async def reload_scoring_model(current_user: Principal = Depends(is_admin)):
+    """Re-read the scoring model file; the previous model stays active on error"""
+    try:
+        await run_db(scoring_engine.reload)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Could not load scoring model: {e}"
+        )
+    # Other worker processes reload on their next cache bus poll
+    await cache_bus.publish("scoring")
+    return scoring_engine.describe()
+
+@router.post("/rescore", status_code=status.HTTP_202_ACCEPTED)
+async def start_rescore(
+    restart: bool = Query(False, description="Ignore the checkpoint of an interrupted run"),
+    current_user: Principal = Depends(is_admin)
+):
+    """Re-score all diagnostics with the active model in a background job"""
+    # The job's database lease keeps other worker processes from starting one too
+    if not await run_db(rescore_job.start, restart=restart):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A re-score job is already running")
+    return rescore_job.status
+
+@router.get("/rescore")
+async def get_rescore_status(current_user: Principal = Depends(is_admin)):
+    """Progress of the current or last re-score job"""
+    return rescore_job.status
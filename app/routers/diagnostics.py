@@ -1,22 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import datetime
-from app.database import get_db
-from app.models.user import User
+from app.database import get_db, run_db
+from app.responses import FAST_SERIALIZATION, FastJSONResponse
 from app.models.diagnostic import Diagnostic
-from app.schemas.diagnostic import DiagnosticCreate, Diagnostic as DiagnosticSchema
+from app.schemas.diagnostic import DiagnosticCreate, Diagnostic as DiagnosticSchema, DiagnosticBatchResult
 from app.auth.jwt import get_current_user
+from app.auth.principal_cache import Principal
 from app.services.audit_service import AuditService
+from app.services.diagnostic_ingest import (
+    DIAGNOSTIC_BATCH_LIMIT, BatchTooLarge, ingest_diagnostics, parse_upload, upload_format
+)
+from app.services.scoring import scoring_engine
+from app.services.diagnostic_export import filter_diagnostics, iter_export
 import random
 import string
 
 router = APIRouter(prefix="/api/diagnostics", tags=["diagnostics"])
 
+# Columns selectable with ?fields=
+DIAGNOSTIC_FIELDS = set(DiagnosticSchema.__fields__)
+
 def calculate_diagnostic_result(protein1, protein2, protein3):
-    # Dummy logic - all diagnostics are positive for now
-    # You can replace this later with your actual diagnostic algorithm
-    return "Positive"
+    # Scored by the active model; see app/services/scoring.py
+    return scoring_engine.score_one(protein1, protein2, protein3)
+
+def score_diagnostics(rows: List[DiagnosticCreate]) -> List[str]:
+    # One vectorized call for the whole batch
+    return scoring_engine.score(
+        [row.protein1 for row in rows],
+        [row.protein2 for row in rows],
+        [row.protein3 for row in rows]
+    )
 
 def generate_identifier():
     # Generate a unique identifier with timestamp component
@@ -29,11 +48,13 @@ async def create_diagnostic(
     request: Request,
     diagnostic: DiagnosticCreate, 
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     audit_service: AuditService = Depends()
 ):
     # Check if identifier already exists
-    existing = db.query(Diagnostic).filter(Diagnostic.identifier == diagnostic.identifier).first()
+    existing = await run_db(
+        db.query(Diagnostic).filter(Diagnostic.identifier == diagnostic.identifier).first
+    )
     if existing:
         # Log duplicate identifier attempt
         await audit_service.log_event(
@@ -49,7 +70,7 @@ async def create_diagnostic(
             detail="Identifier already exists. Please use a unique identifier."
         )
     
-    # Calculate diagnostic result (currently dummy logic)
+    # Calculate diagnostic result
     result = calculate_diagnostic_result(
         diagnostic.protein1, 
         diagnostic.protein2, 
@@ -65,8 +86,8 @@ async def create_diagnostic(
         user_id=current_user.id
     )
     db.add(db_diagnostic)
-    db.commit()
-    db.refresh(db_diagnostic)
+    await run_db(db.commit)
+    await run_db(db.refresh, db_diagnostic)
     
     # Log successful diagnostic creation
     await audit_service.log_event(
@@ -86,38 +107,184 @@ async def create_diagnostic(
     
     return db_diagnostic
 
+async def _ingest(request, raw_rows, db, current_user, audit_service, source):
+    """Run a batch ingest and write one audit event summarising it"""
+    try:
+        summary = await run_db(ingest_diagnostics, db, raw_rows, current_user.id, score_diagnostics)
+    except BatchTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except IntegrityError:
+        # Another request inserted one of the identifiers after our duplicate check
+        raise HTTPException(
+            status_code=409,
+            detail="Batch conflicts with a concurrent insert. Please retry."
+        )
+
+    await audit_service.log_event(
+        action="create_diagnostics_batch",
+        entity_type="diagnostic",
+        user_id=current_user.id,
+        details={
+            "source": source,
+            "received": summary["received"],
+            "created": summary["created"],
+            "duplicates": sum(1 for row in summary["results"] if row["status"] == "duplicate"),
+            "invalid": sum(1 for row in summary["results"] if row["status"] == "invalid")
+        },
+        request=request
+    )
+    return summary
+
+@router.post("/batch", response_model=DiagnosticBatchResult)
+async def create_diagnostics_batch(
+    request: Request,
+    diagnostics: List[dict],
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+    audit_service: AuditService = Depends()
+):
+    """
+    Create many diagnostics at once. Rows are validated individually, so one
+    bad row does not reject the batch; see `results` for each row's outcome.
+    """
+    if len(diagnostics) > DIAGNOSTIC_BATCH_LIMIT:
+        raise HTTPException(status_code=413, detail=f"Batches are limited to {DIAGNOSTIC_BATCH_LIMIT} rows")
+    return await _ingest(request, diagnostics, db, current_user, audit_service, "json")
+
+@router.post("/upload", response_model=DiagnosticBatchResult)
+async def upload_diagnostics(
+    request: Request,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+    audit_service: AuditService = Depends()
+):
+    """Create diagnostics from a CSV (with header row) or NDJSON file"""
+    source = upload_format(file.filename or "", file.content_type or "")
+    raw_rows = parse_upload(file.file, source)
+    return await _ingest(request, raw_rows, db, current_user, audit_service, source)
+
 @router.get("/", response_model=List[DiagnosticSchema])
 async def read_diagnostics(
     request: Request,
-    skip: int = 0, 
-    limit: int = 100, 
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[int] = Query(None, description="Keyset cursor: the id from the X-Next-Cursor header of the previous page"),
+    order: str = Query("asc", regex="^(asc|desc)$"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. id,identifier,result"),
+    result: Optional[str] = None,
+    start_date: Optional[datetime.datetime] = None,
+    end_date: Optional[datetime.datetime] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     audit_service: AuditService = Depends()
 ):
-    diagnostics = db.query(Diagnostic).filter(Diagnostic.user_id == current_user.id).offset(skip).limit(limit).all()
-    
+    """
+    List the current user's diagnostics ordered by id.
+
+    When a page is full, its X-Next-Cursor header holds the value to pass as
+    `after` for the next page, which is read from the (user_id, id) index
+    at the same cost at any depth. `skip` still works but scans every
+    skipped row. With `fields`, only those columns are selected and returned.
+    With `fields` or FAST_SERIALIZATION, rows are encoded straight from
+    tuples instead of going through DiagnosticSchema.
+    """
+    if fields:
+        requested = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in requested if name not in DIAGNOSTIC_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        # id is always included so the cursor can be built
+        columns = ["id"] + [name for name in dict.fromkeys(requested) if name != "id"]
+        query = select(*(getattr(Diagnostic, name) for name in columns))
+    elif FAST_SERIALIZATION:
+        columns = list(DiagnosticSchema.__fields__)
+        query = select(*(getattr(Diagnostic, name) for name in columns))
+    else:
+        columns = None
+        query = select(Diagnostic)
+
+    query = filter_diagnostics(query, current_user.id, result=result, start_date=start_date, end_date=end_date)
+    if after is not None:
+        query = query.where(Diagnostic.id > after if order == "asc" else Diagnostic.id < after)
+    elif skip:
+        query = query.offset(skip)
+    query = query.order_by(Diagnostic.id.asc() if order == "asc" else Diagnostic.id.desc()).limit(limit)
+
+    if columns:
+        rows = await run_db(lambda: db.execute(query).all())
+        diagnostics = [dict(zip(columns, row)) for row in rows]
+        last_id = rows[-1].id if rows else None
+    else:
+        diagnostics = await run_db(lambda: db.scalars(query).all())
+        last_id = diagnostics[-1].id if diagnostics else None
+
     # Log diagnostic data access
     await audit_service.log_event(
         action="view_diagnostics",
         entity_type="diagnostic",
         user_id=current_user.id,
-        details={"count": len(diagnostics), "skip": skip, "limit": limit},
+        details={"count": len(diagnostics), "skip": skip, "limit": limit, "after": after, "fields": fields},
         request=request
     )
-    
+
+    headers = {"X-Next-Cursor": str(last_id)} if len(diagnostics) == limit else {}
+    if columns:
+        # Plain dicts from row tuples: skip response_model validation
+        return FastJSONResponse(content=diagnostics, headers=headers)
+    response.headers.update(headers)
     return diagnostics
 
+@router.get("/export")
+async def export_diagnostics(
+    request: Request,
+    format: str = Query("csv", regex="^(csv|ndjson)$"),
+    compress: bool = Query(False, description="gzip the file on the fly"),
+    result: Optional[str] = None,
+    start_date: Optional[datetime.datetime] = None,
+    end_date: Optional[datetime.datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+    audit_service: AuditService = Depends()
+):
+    """Download all of the current user's diagnostics as CSV or NDJSON"""
+    await audit_service.log_event(
+        action="export_diagnostics",
+        entity_type="diagnostic",
+        user_id=current_user.id,
+        details={
+            "format": format,
+            "compress": compress,
+            "result": result,
+            "start_date": start_date.isoformat() if start_date else None,
+            "end_date": end_date.isoformat() if end_date else None
+        },
+        request=request
+    )
+
+    body = iter_export(
+        db, current_user.id, format, compress,
+        result=result, start_date=start_date, end_date=end_date
+    )
+    filename = f"diagnostics.{format}" + (".gz" if compress else "")
+    media_type = "application/gzip" if compress else ("text/csv" if format == "csv" else "application/x-ndjson")
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.delete("/{diagnostic_id}", status_code=204)
 async def delete_diagnostic(
     request: Request,
     diagnostic_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     audit_service: AuditService = Depends()
 ):
     # Find the diagnostic by ID
-    diagnostic = db.query(Diagnostic).filter(Diagnostic.id == diagnostic_id).first()
+    diagnostic = await run_db(db.query(Diagnostic).filter(Diagnostic.id == diagnostic_id).first)
     
     # Check if diagnostic exists
     if not diagnostic:
@@ -161,6 +328,6 @@ async def delete_diagnostic(
     
     # Delete the diagnostic
     db.delete(diagnostic)
-    db.commit()
+    await run_db(db.commit)
     
     return None
\ No newline at end of file
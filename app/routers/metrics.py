@@ -0,0 +1,41 @@
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from app.auth.password_pool import password_pool
+from app.auth.principal_cache import principal_cache
+from app.services.metrics import METRICS_TOKEN, metrics_registry
+
+# Only included when METRICS_ENABLED is set; see app/main.py
+router = APIRouter(tags=["metrics"])
+
+async def require_metrics_token(authorization: Optional[str] = Header(None)):
+    """Only the scraper holding METRICS_TOKEN may read per-route timings"""
+    if not METRICS_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Set METRICS_TOKEN to enable /metrics"
+        )
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_token)])
+async def metrics():
+    """Prometheus scrape endpoint"""
+    cache = principal_cache.stats()
+    return PlainTextResponse(
+        metrics_registry.render(extra=[
+            ("womsoft_principal_cache_size", "gauge", "Users held in the principal cache", cache["size"]),
+            ("womsoft_principal_cache_hits_total", "counter", "Principal cache hits", cache["hits"]),
+            ("womsoft_principal_cache_misses_total", "counter", "Principal cache misses", cache["misses"]),
+            ("womsoft_password_pool_pending", "gauge", "bcrypt calls running or queued", password_pool.pending),
+        ]),
+        media_type="text/plain; version=0.0.4"
+    )
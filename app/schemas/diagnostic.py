@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class DiagnosticBase(BaseModel):
     protein1: float
@@ -18,4 +18,18 @@ class Diagnostic(DiagnosticBase):
     timestamp: datetime
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class DiagnosticRowResult(BaseModel):
+    index: int
+    identifier: Optional[str]
+    status: str  # "created", "duplicate" or "invalid"
+    id: Optional[int] = None
+    result: Optional[str] = None
+    error: Optional[str] = None
+
+class DiagnosticBatchResult(BaseModel):
+    received: int
+    created: int
+    failed: int
+    results: List[DiagnosticRowResult]
@@ -0,0 +1,356 @@
+"""
+Column-oriented archive of audit logs.
+
+Archived rows are partitioned by day. Each partition holds one or more
+segments (one per archive run that touched the day), and each segment stores
+every column in its own gzip file with one JSON value per line:
+
+    <archive dir>/
+        manifest.json
+        2025-03-14/
+            seg-20250414_020000_000000-0/
+                id.gz  user_id.gz  action.gz  timestamp.gz  ...
+
+manifest.json records per segment the row count, the timestamp and id range,
+whether the rows were written in (timestamp, id) order and, while they stay
+small, the distinct actions, entity types and user ids.
+Readers use it to skip partitions and segments that cannot match a query.
+"""
+import gzip
+import heapq
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from array import array
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional
+
+AUDIT_ARCHIVE_DIR = os.environ.get(
+    "AUDIT_ARCHIVE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "audit_backups", "columnar")
+)
+
+COLUMNS = ["id", "user_id", "action", "entity_type", "entity_id", "timestamp", "details", "ip_address", "user_agent"]
+MANIFEST_NAME = "manifest.json"
+
+# Distinct values tracked per segment before the stat is dropped
+MAX_DISTINCT_VALUES = 256
+# Segments kept open at once while writing; older days are closed first
+MAX_OPEN_SEGMENTS = 8
+
+# Manifest stat name for each column that supports set pruning
+SET_STATS = {"action": "actions", "entity_type": "entity_types", "user_id": "user_ids"}
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps are naive UTC; convert aware bounds to compare with them"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def load_manifest(base_dir: str) -> Dict[str, Any]:
+    path = os.path.join(base_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"version": 1, "columns": COLUMNS, "partitions": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(base_dir: str, manifest: Dict[str, Any]):
+    """Replace the manifest atomically so readers never see a partial file"""
+    path = os.path.join(base_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def drop_partitions_before(base_dir: str, cutoff: date) -> int:
+    """
+    Retention for the archive: remove whole day partitions older than cutoff.
+    Each drop is a directory removal plus a manifest update, independent of
+    how many rows the day holds. Returns the number of rows dropped.
+    """
+    manifest = load_manifest(base_dir)
+    expired = [name for name in manifest["partitions"] if date.fromisoformat(name) < cutoff]
+    if not expired:
+        return 0
+
+    dropped = 0
+    for name in expired:
+        dropped += sum(entry["rows"] for entry in manifest["partitions"].pop(name))
+    # Publish the smaller manifest first so readers never open a removed directory
+    save_manifest(base_dir, manifest)
+    for name in expired:
+        shutil.rmtree(os.path.join(base_dir, name), ignore_errors=True)
+    return dropped
+
+
+class _SegmentWriter:
+    def __init__(self, base_dir: str, partition: str, name: str, columns: List[str]):
+        self.path = f"{partition}/{name}"
+        directory = os.path.join(base_dir, partition, name)
+        os.makedirs(directory, exist_ok=True)
+        self.columns = columns
+        self.files = {
+            column: gzip.open(os.path.join(directory, f"{column}.gz"), "wt", encoding="utf-8")
+            for column in columns
+        }
+        self.rows = 0
+        self.min_ts = self.max_ts = None
+        self.min_id = self.max_id = None
+        self.last_key = None
+        self.ordered = True
+        self.distinct = {column: set() for column in SET_STATS}
+
+    def write(self, row: Dict[str, Any]):
+        for column in self.columns:
+            value = row.get(column)
+            if isinstance(value, datetime):
+                value = value.isoformat(sep=" ")
+            self.files[column].write(json.dumps(value))
+            self.files[column].write("\n")
+
+        timestamp = parse_timestamp(row["timestamp"])
+        key = (timestamp, row["id"])
+        if self.last_key is not None and key < self.last_key:
+            self.ordered = False
+        self.last_key = key
+        self.min_ts = timestamp if self.min_ts is None else min(self.min_ts, timestamp)
+        self.max_ts = timestamp if self.max_ts is None else max(self.max_ts, timestamp)
+        self.min_id = row["id"] if self.min_id is None else min(self.min_id, row["id"])
+        self.max_id = row["id"] if self.max_id is None else max(self.max_id, row["id"])
+        for column, values in self.distinct.items():
+            if values is not None:
+                values.add(row.get(column))
+                if len(values) > MAX_DISTINCT_VALUES:
+                    self.distinct[column] = None
+        self.rows += 1
+
+    def flush(self):
+        for f in self.files.values():
+            f.flush()
+            f.buffer.flush()
+            f.buffer.fileobj.flush()
+            os.fsync(f.buffer.fileobj.fileno())
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+    def manifest_entry(self) -> Dict[str, Any]:
+        entry = {
+            "path": self.path,
+            "rows": self.rows,
+            "min_ts": self.min_ts.isoformat(sep=" "),
+            "max_ts": self.max_ts.isoformat(sep=" "),
+            "min_id": self.min_id,
+            "max_id": self.max_id,
+            "sorted": self.ordered,
+        }
+        for column, stat in SET_STATS.items():
+            values = self.distinct[column]
+            entry[stat] = sorted(values, key=lambda v: (v is None, v)) if values is not None else None
+        return entry
+
+
+class ColumnarArchiveWriter:
+    """
+    Append audit rows to the columnar archive.
+
+    Rows only become visible to readers once flush() has synced the column
+    files and rewritten the manifest, so callers should flush before
+    deleting the archived rows from the live table.
+    """
+
+    def __init__(self, base_dir: str = AUDIT_ARCHIVE_DIR, columns: List[str] = COLUMNS):
+        self.base_dir = base_dir
+        self.columns = columns
+        os.makedirs(base_dir, exist_ok=True)
+        self.manifest = load_manifest(base_dir)
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self._segment_count = 0
+        self._open: "OrderedDict[str, _SegmentWriter]" = OrderedDict()
+
+    def writerow(self, row):
+        """Write one row, given as a dict or a sequence in column order"""
+        if not isinstance(row, dict):
+            row = dict(zip(self.columns, row))
+        partition = parse_timestamp(row["timestamp"]).date().isoformat()
+
+        segment = self._open.get(partition)
+        if segment is None:
+            segment = _SegmentWriter(self.base_dir, partition, f"seg-{self.run_id}-{self._segment_count}", self.columns)
+            self._segment_count += 1
+            self._open[partition] = segment
+            if len(self._open) > MAX_OPEN_SEGMENTS:
+                self._close_segment(next(iter(self._open)))
+        self._open.move_to_end(partition)
+        segment.write(row)
+
+    def flush(self):
+        """Sync every open segment and publish it in the manifest"""
+        for segment in self._open.values():
+            segment.flush()
+            self._record(segment)
+        save_manifest(self.base_dir, self.manifest)
+
+    def close(self):
+        self.flush()
+        for partition in list(self._open):
+            self._close_segment(partition, publish=False)
+
+    def _close_segment(self, partition: str, publish: bool = True):
+        segment = self._open.pop(partition)
+        segment.flush()
+        segment.close()
+        if publish:
+            self._record(segment)
+            save_manifest(self.base_dir, self.manifest)
+
+    def _record(self, segment: _SegmentWriter):
+        if segment.rows == 0:
+            return
+        partition = segment.path.split("/", 1)[0]
+        entries = self.manifest["partitions"].setdefault(partition, [])
+        entries[:] = [entry for entry in entries if entry["path"] != segment.path]
+        entries.append(segment.manifest_entry())
+
+
+class ColumnarArchiveReader:
+    """
+    Query the columnar archive with the same filters as AuditService.get_logs.
+
+    Only the segments whose manifest stats can match are opened and their
+    column files are read line by line in lockstep. Segments written in
+    (timestamp, id) order are streamed, newest first through a temporary
+    spill file, so memory does not grow with the size of a day.
+    """
+
+    def __init__(self, base_dir: str = AUDIT_ARCHIVE_DIR):
+        self.base_dir = base_dir
+        self.manifest = load_manifest(base_dir)
+
+    def partitions(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> List[str]:
+        """Partition names overlapping the date range, oldest first"""
+        start_date, end_date = naive_utc(start_date), naive_utc(end_date)
+        names = sorted(self.manifest["partitions"])
+        if start_date:
+            names = [name for name in names if date.fromisoformat(name) >= start_date.date()]
+        if end_date:
+            names = [name for name in names if date.fromisoformat(name) <= end_date.date()]
+        return names
+
+    def iter_logs(
+        self,
+        action: Optional[str] = None,
+        entity_type: Optional[str] = None,
+        entity_id: Optional[str] = None,
+        user_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        descending: bool = True,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield matching rows as dicts ordered by (timestamp, id)"""
+        filters = {"action": action, "entity_type": entity_type, "entity_id": entity_id, "user_id": user_id}
+        # Falsy filters are ignored, as in AuditService.get_logs
+        filters = {column: value for column, value in filters.items() if value}
+        start_date, end_date = naive_utc(start_date), naive_utc(end_date)
+
+        partitions = self.partitions(start_date, end_date)
+        if descending:
+            partitions.reverse()
+
+        for partition in partitions:
+            segment_rows = [
+                self._ordered_rows(entry, filters, start_date, end_date, descending)
+                for entry in self.manifest["partitions"][partition]
+                if self._segment_may_match(entry, filters, start_date, end_date)
+            ]
+            # Segments of one day can interleave in time
+            yield from heapq.merge(*segment_rows, key=_sort_key, reverse=descending)
+
+    def get_logs(self, limit: int = 100, offset: int = 0, **filters) -> List[Dict[str, Any]]:
+        """Newest-first page of archived logs, like AuditService.get_logs"""
+        return list(islice(self.iter_logs(**filters), offset, offset + limit))
+
+    @staticmethod
+    def _segment_may_match(entry, filters, start_date, end_date) -> bool:
+        if start_date and parse_timestamp(entry["max_ts"]) < start_date:
+            return False
+        if end_date and parse_timestamp(entry["min_ts"]) > end_date:
+            return False
+        for column, stat in SET_STATS.items():
+            if column in filters and entry.get(stat) is not None and filters[column] not in entry[stat]:
+                return False
+        return True
+
+    def _ordered_rows(self, entry, filters, start_date, end_date, descending) -> Iterator[Dict[str, Any]]:
+        rows = self._scan_segment(entry, filters, start_date, end_date)
+        if not entry.get("sorted"):
+            # Written out of order, or before the manifest recorded it
+            return iter(sorted(rows, key=_sort_key, reverse=descending))
+        return _reversed(rows) if descending else rows
+
+    def _scan_segment(self, entry, filters, start_date, end_date) -> Iterator[Dict[str, Any]]:
+        directory = os.path.join(self.base_dir, entry["path"])
+        files = [gzip.open(os.path.join(directory, f"{column}.gz"), "rt", encoding="utf-8") for column in COLUMNS]
+        try:
+            # Only the first entry["rows"] lines were synced before the manifest
+            # was written; anything after that belongs to an interrupted run
+            lines = islice(_tolerant_zip(files), entry["rows"])
+            for raw_values in lines:
+                raw = dict(zip(COLUMNS, raw_values))
+                if any(json.loads(raw[column]) != value for column, value in filters.items()):
+                    continue
+                timestamp = parse_timestamp(json.loads(raw["timestamp"]))
+                if (start_date and timestamp < start_date) or (end_date and timestamp > end_date):
+                    continue
+                row = {column: json.loads(value) for column, value in raw.items()}
+                row["timestamp"] = timestamp
+                yield row
+        finally:
+            for f in files:
+                f.close()
+
+
+def _sort_key(row: Dict[str, Any]):
+    return row["timestamp"], row["id"]
+
+
+def _reversed(rows: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Yield rows last to first, keeping only their offsets in a spill file in memory"""
+    with tempfile.TemporaryFile() as spill:
+        offsets = array("q")
+        for row in rows:
+            offsets.append(spill.tell())
+            pickle.dump(row, spill, protocol=pickle.HIGHEST_PROTOCOL)
+        for offset in reversed(offsets):
+            spill.seek(offset)
+            yield pickle.load(spill)
+
+
+def _tolerant_zip(files) -> Iterator[tuple]:
+    """zip() over column files that stops quietly at a truncated gzip stream"""
+    iterators = [iter(f) for f in files]
+    while True:
+        values = []
+        try:
+            for it in iterators:
+                values.append(next(it))
+        except (StopIteration, EOFError):
+            return
+        yield tuple(values)
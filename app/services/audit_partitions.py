@@ -0,0 +1,222 @@
+"""
+Monthly partitions of the live audit log.
+
+audit_logs holds the current month and receives every write. Once a month
+has closed, seal_closed_months() moves its rows into a table of their own,
+audit_logs_YYYY_MM, a few thousand rows per transaction; every row is moved
+exactly once. After that:
+
+- retention drops whole month tables (drop_partitions_before), with no
+  per-row work however many rows the month holds, and only deletes row by
+  row in the month the cutoff falls in (delete_logs_before);
+- reads go through audit_log_source()/audit_log_entity(), which union
+  audit_logs with only the month tables overlapping the requested date
+  range. The filters are pushed into every branch, so each one still uses
+  its own indexes.
+"""
+import asyncio
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import Column, Index, MetaData, Table, delete, func, inspect, insert, select, union_all
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session, aliased
+
+from app.database import run_db, startup_lock
+from app.services.audit_archive import naive_utc
+from app.models.audit import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for closed months to seal, 0 disables the background task
+AUDIT_PARTITION_INTERVAL = float(os.environ.get("AUDIT_PARTITION_INTERVAL", "3600"))
+# Rows moved per transaction while sealing a month
+AUDIT_PARTITION_CHUNK_SIZE = int(os.environ.get("AUDIT_PARTITION_CHUNK_SIZE", "2000"))
+
+PARTITION_PREFIX = f"{AuditLog.__tablename__}_"
+_PARTITION_NAME = re.compile(rf"^{PARTITION_PREFIX}(\d{{4}})_(\d{{2}})$")
+
+# Month tables are created and dropped at runtime, so they live outside
+# Base.metadata; definitions are added from threadpool threads
+_partition_metadata = MetaData()
+_partition_metadata_lock = threading.Lock()
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def next_month(value: datetime) -> datetime:
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y_%m}"
+
+
+def partition_month(name: str) -> Optional[datetime]:
+    """First instant of the month a partition table holds, None for other tables"""
+    match = _PARTITION_NAME.match(name)
+    return datetime(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def partition_table(name: str) -> Table:
+    """Table object of a month partition: the audit_logs columns and indexes"""
+    with _partition_metadata_lock:
+        table = _partition_metadata.tables.get(name)
+        if table is None:
+            table = _define_partition(name)
+        return table
+
+
+def _define_partition(name: str) -> Table:
+    source = AuditLog.__table__
+    # No foreign keys: partitions only need to be readable, and the users
+    # table is not part of this metadata
+    columns = [
+        Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+        for column in source.columns
+    ]
+    indexes = [
+        Index(index.name.replace(AuditLog.__tablename__, name, 1), *(column.name for column in index.columns))
+        for index in source.indexes
+    ]
+    return Table(name, _partition_metadata, *columns, *indexes)
+
+
+def list_partitions(conn: Connection) -> Dict[str, datetime]:
+    """Existing month partitions, name -> first instant of the month"""
+    months = {}
+    for name in inspect(conn).get_table_names():
+        month = partition_month(name)
+        if month is not None:
+            months[name] = month
+    return dict(sorted(months.items()))
+
+
+def partitions_in_range(
+    conn: Connection,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> List[str]:
+    """Names of the month partitions that can hold rows between start_date and end_date"""
+    start_date = naive_utc(start_date)
+    end_date = naive_utc(end_date)
+    return [
+        name for name, month in list_partitions(conn).items()
+        if (end_date is None or month <= end_date) and (start_date is None or next_month(month) > start_date)
+    ]
+
+
+def audit_log_source(conn: Connection, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+    """
+    Selectable with the audit_logs columns covering the live table and the
+    month partitions overlapping the date range; the plain table when none do
+    """
+    names = partitions_in_range(conn, start_date, end_date)
+    if not names:
+        return AuditLog.__table__
+    selects = [select(AuditLog.__table__)] + [select(partition_table(name)) for name in names]
+    return union_all(*selects).subquery("audit_logs_all")
+
+
+def audit_log_entity(db: Session, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+    """AuditLog, or an alias of it over audit_log_source() for ORM queries"""
+    source = audit_log_source(db.connection(), start_date, end_date)
+    if source is AuditLog.__table__:
+        return AuditLog
+    return aliased(AuditLog, source)
+
+
+def seal_closed_months(engine: Engine, now: Optional[datetime] = None, chunk_size: int = AUDIT_PARTITION_CHUNK_SIZE) -> int:
+    """
+    Move rows of closed months from audit_logs into their month partitions.
+    Each chunk is moved in one transaction under startup_lock, so several
+    workers can run this at once. The newest row always stays in audit_logs
+    so that SQLite keeps handing out increasing ids. Returns the rows moved.
+    """
+    boundary = month_start(now or datetime.utcnow())
+    hot = AuditLog.__table__
+    moved = 0
+    while True:
+        with startup_lock(engine) as conn:
+            newest_id = conn.scalar(select(func.max(hot.c.id)))
+            rows = conn.execute(
+                select(hot)
+                .where(hot.c.timestamp < boundary, hot.c.id < newest_id)
+                .order_by(hot.c.timestamp, hot.c.id)
+                .limit(chunk_size)
+            ).all() if newest_id is not None else []
+            if not rows:
+                return moved
+
+            by_month: Dict[datetime, list] = {}
+            for row in rows:
+                by_month.setdefault(month_start(row.timestamp), []).append(row._asdict())
+            for month, values in by_month.items():
+                table = partition_table(partition_name(month))
+                table.create(conn, checkfirst=True)
+                conn.execute(insert(table), values)
+            conn.execute(delete(hot).where(hot.c.id.in_([row.id for row in rows])))
+        moved += len(rows)
+
+
+def drop_partitions_before(engine: Engine, cutoff: datetime) -> int:
+    """
+    Retention: drop every month partition that ends before cutoff. Returns
+    the number of rows dropped.
+    """
+    cutoff = naive_utc(cutoff)
+    dropped = 0
+    with startup_lock(engine) as conn:
+        for name, month in list_partitions(conn).items():
+            if next_month(month) > cutoff:
+                continue
+            table = partition_table(name)
+            dropped += conn.scalar(select(func.count()).select_from(table))
+            table.drop(conn)
+    return dropped
+
+
+def delete_logs_before(engine: Engine, cutoff: datetime, chunk_size: int = AUDIT_PARTITION_CHUNK_SIZE) -> int:
+    """
+    Retention for what drop_partitions_before leaves: delete the rows older
+    than cutoff from audit_logs and from the partition of the month cutoff
+    falls in, a chunk per transaction. The newest row of audit_logs is kept,
+    as in seal_closed_months. Returns the number of rows deleted.
+    """
+    cutoff = naive_utc(cutoff)
+    hot = AuditLog.__table__
+    with startup_lock(engine) as conn:
+        names = [name for name, month in list_partitions(conn).items() if month < cutoff]
+    deleted = 0
+    for table in [hot] + [partition_table(name) for name in names]:
+        while True:
+            with startup_lock(engine) as conn:
+                condition = table.c.timestamp < cutoff
+                if table is hot:
+                    newest_id = conn.scalar(select(func.max(hot.c.id)))
+                    condition = condition & (hot.c.id < (newest_id or 0))
+                ids = conn.scalars(select(table.c.id).where(condition).limit(chunk_size)).all()
+                if ids:
+                    conn.execute(delete(table).where(table.c.id.in_(ids)))
+            if not ids:
+                break
+            deleted += len(ids)
+    return deleted
+
+
+async def audit_partition_loop(engine: Engine, interval: float):
+    """Seal closed months every `interval` seconds until cancelled"""
+    while True:
+        try:
+            moved = await run_db(seal_closed_months, engine)
+            if moved:
+                logger.info("Moved %d audit log entries into monthly partitions", moved)
+        except Exception:
+            logger.exception("Sealing audit log partitions failed")
+        await asyncio.sleep(interval)
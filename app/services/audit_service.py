@@ -1,13 +1,20 @@
+import heapq
 import json
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional, List
+from typing import Any, Dict, Iterator, Optional, List
 
 from fastapi import Depends, Request
-from sqlalchemy import desc
+from sqlalchemy import desc, select
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_db, run_db
 from app.models.audit import AuditLog
+from app.services.audit_writer import audit_writer, AUDIT_SYNC_ACTIONS
+from app.services.audit_archive import AUDIT_ARCHIVE_DIR, ColumnarArchiveReader, naive_utc
+from app.services.audit_partitions import (
+    audit_log_entity, audit_log_source, delete_logs_before, drop_partitions_before, seal_closed_months
+)
+from app.services.metrics import timed
 
 class AuditService:
     def __init__(self, db: Session = Depends(get_db)):
@@ -24,6 +31,10 @@ class AuditService:
     ) -> AuditLog:
         """
         Log an auditable event
+
+        When the background writer is running the entry is queued and the
+        returned AuditLog is not yet persisted (its id is None). Actions listed
+        in AUDIT_SYNC_ACTIONS are always committed before returning.
         """
         # Get IP and user agent if request is provided
         ip_address = None
@@ -40,24 +51,37 @@ class AuditService:
                 details["password"] = "[REDACTED]"
             details_json = json.dumps(details)
 
-        # Create audit log entry
-        audit_log = AuditLog(
-            user_id=user_id,
-            action=action,
-            entity_type=entity_type,
-            entity_id=entity_id,
-            details=details_json,
-            ip_address=ip_address,
-            user_agent=user_agent,
-        )
-
-        # Add to database
+        values = {
+            "user_id": user_id,
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "details": details_json,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+        }
+
+        with timed("audit"):
+            # Hand off to the background writer unless this event must be durable now
+            if action not in AUDIT_SYNC_ACTIONS:
+                # The row is inserted later, so stamp the event time now
+                queued = dict(values, timestamp=datetime.utcnow())
+                if audit_writer.enqueue(self.db.get_bind(), queued):
+                    return AuditLog(**queued)
+
+            # Create audit log entry
+            audit_log = AuditLog(**values)
+
+            # Add to database
+            await run_db(self._save, audit_log)
+        
+        return audit_log
+
+    def _save(self, audit_log: AuditLog):
         self.db.add(audit_log)
         self.db.commit()
         self.db.refresh(audit_log)
-        
-        return audit_log
-        
+
     async def get_logs(
         self,
         action: Optional[str] = None,
@@ -71,47 +95,114 @@ class AuditService:
     ) -> List[AuditLog]:
         """
         Get audit logs with optional filtering and pagination
+
+        Only the monthly partitions overlapping start_date..end_date are read.
         """
-        query = self.db.query(AuditLog)
+        entity = await run_db(audit_log_entity, self.db, start_date, end_date)
+        query = self.db.query(entity)
         
         # Apply filters if provided
         if action:
-            query = query.filter(AuditLog.action == action)
+            query = query.filter(entity.action == action)
         if entity_type:
-            query = query.filter(AuditLog.entity_type == entity_type)
+            query = query.filter(entity.entity_type == entity_type)
         if entity_id:
-            query = query.filter(AuditLog.entity_id == entity_id)
+            query = query.filter(entity.entity_id == entity_id)
         if user_id:
-            query = query.filter(AuditLog.user_id == user_id)
+            query = query.filter(entity.user_id == user_id)
         if start_date:
-            query = query.filter(AuditLog.timestamp >= start_date)
+            query = query.filter(entity.timestamp >= start_date)
         if end_date:
-            query = query.filter(AuditLog.timestamp <= end_date)
+            query = query.filter(entity.timestamp <= end_date)
         
         # Order by timestamp descending (newest first)
-        query = query.order_by(desc(AuditLog.timestamp))
+        query = query.order_by(desc(entity.timestamp), desc(entity.id))
         
         # Apply pagination
         query = query.limit(limit).offset(offset)
         
         # Execute query and return results
-        return query.all()
+        return await run_db(query.all)
+
+    def iter_logs(
+        self,
+        action: Optional[str] = None,
+        entity_type: Optional[str] = None,
+        entity_id: Optional[str] = None,
+        user_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        include_archived: bool = False,
+        archive_dir: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily yield matching logs as dicts, newest first.
+
+        Only the monthly partitions of the live log that overlap the date
+        range are read. With include_archived the result is merged with the
+        columnar archive, whose partitions are pruned the same way. Rows archived
+        twice or still present in the live table are only yielded once.
+        This is a blocking generator, iterate it from a worker thread.
+        """
+        # Both sources store naive UTC; an offset in the bounds would make the
+        # archive comparisons raise mid-stream
+        start_date, end_date = naive_utc(start_date), naive_utc(end_date)
+        table = audit_log_source(self.db.connection(), start_date, end_date)
+        stmt = select(table)
+        if action:
+            stmt = stmt.where(table.c.action == action)
+        if entity_type:
+            stmt = stmt.where(table.c.entity_type == entity_type)
+        if entity_id:
+            stmt = stmt.where(table.c.entity_id == entity_id)
+        if user_id:
+            stmt = stmt.where(table.c.user_id == user_id)
+        if start_date:
+            stmt = stmt.where(table.c.timestamp >= start_date)
+        if end_date:
+            stmt = stmt.where(table.c.timestamp <= end_date)
+        stmt = stmt.order_by(table.c.timestamp.desc(), table.c.id.desc())
+
+        result = self.db.execute(stmt.execution_options(yield_per=500))
+        sources = [(row._asdict() for row in result)]
+
+        if include_archived:
+            reader = ColumnarArchiveReader(archive_dir or AUDIT_ARCHIVE_DIR)
+            sources.append(reader.iter_logs(
+                action=action,
+                entity_type=entity_type,
+                entity_id=entity_id,
+                user_id=user_id,
+                start_date=start_date,
+                end_date=end_date,
+                descending=True,
+            ))
+
+        previous_key = None
+        for row in heapq.merge(*sources, key=_log_sort_key, reverse=True):
+            key = _log_sort_key(row)
+            if key != previous_key:
+                yield row
+            previous_key = key
 
     async def delete_old_logs(self, days: int = 30) -> int:
         """
         Delete audit logs older than the specified number of days
         Returns the number of logs deleted
+
+        Closed months are first moved into their monthly partitions, then
+        every partition whose month ended before the cutoff is dropped as a
+        whole. Only the expired rows of the month the cutoff falls in, and of
+        audit_logs, are deleted one chunk at a time. The single newest log is
+        always kept so that ids keep increasing.
         """
         # Calculate the cutoff date
-        cutoff_date = datetime.now() - timedelta(days=days)
-        
-        # Find logs older than the cutoff date
-        old_logs = self.db.query(AuditLog).filter(AuditLog.timestamp < cutoff_date).all()
-        count = len(old_logs)
-        
-        # Delete the logs
-        if count > 0:
-            self.db.query(AuditLog).filter(AuditLog.timestamp < cutoff_date).delete()
-            self.db.commit()
-        
-        return count
\ No newline at end of file
+        cutoff_date = datetime.utcnow() - timedelta(days=days)
+        engine = self.db.get_bind()
+        await run_db(seal_closed_months, engine)
+        dropped = await run_db(drop_partitions_before, engine, cutoff_date)
+        return dropped + await run_db(delete_logs_before, engine, cutoff_date)
+
+
+def _log_sort_key(row: Dict[str, Any]):
+    return row["timestamp"], row["id"]
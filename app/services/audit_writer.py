@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+from app.database import run_db
+from app.models.audit import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# "batched" queues audit rows for the background writer, "sync" writes every
+# event inline in the request like before
+AUDIT_WRITE_MODE = os.environ.get("AUDIT_WRITE_MODE", "batched").lower()
+AUDIT_BATCH_SIZE = int(os.environ.get("AUDIT_BATCH_SIZE", "100"))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get("AUDIT_FLUSH_INTERVAL", "0.5"))
+AUDIT_QUEUE_SIZE = int(os.environ.get("AUDIT_QUEUE_SIZE", "10000"))
+# Extra attempts at a batch that hit a locked database, e.g. while another
+# worker process holds the SQLite write lock longer than busy_timeout
+AUDIT_WRITE_RETRIES = int(os.environ.get("AUDIT_WRITE_RETRIES", "3"))
+
+# Events that must be on disk before the response goes out, even in batched mode
+AUDIT_SYNC_ACTIONS = {
+    action.strip()
+    for action in os.environ.get("AUDIT_SYNC_ACTIONS", "login_failed,register_failed").split(",")
+    if action.strip()
+}
+
+# Marker put on the queue to tell the flusher to drain and exit
+_STOP = object()
+
+
+class AuditWriter:
+    """
+    Collects audit log rows on an in-memory queue and writes them to the
+    database in batches from a background task
+    """
+
+    def __init__(
+        self,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL,
+        max_queue_size: int = AUDIT_QUEUE_SIZE,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Start the flusher task on the current event loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write out everything still queued and stop the flusher task"""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    def enqueue(self, bind: Engine, values: Dict[str, Any]) -> bool:
+        """
+        Queue one audit row for insertion through the given engine.
+        Returns False if the writer is not running or the queue is full,
+        in which case the caller should write the row itself.
+        """
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait((bind, values))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            # Keep collecting until the batch is full or the interval has passed
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[Engine, Dict[str, Any]]]):
+        # Group rows by engine so each one gets a single multi-row insert
+        rows_by_bind: Dict[Engine, List[Dict[str, Any]]] = {}
+        for bind, values in batch:
+            rows_by_bind.setdefault(bind, []).append(values)
+
+        for bind, rows in rows_by_bind.items():
+            for attempt in range(AUDIT_WRITE_RETRIES + 1):
+                try:
+                    await run_db(self._write_rows, bind, rows)
+                    break
+                except OperationalError:
+                    if attempt == AUDIT_WRITE_RETRIES:
+                        logger.exception("Failed to write %d audit log entries", len(rows))
+                        break
+                    await asyncio.sleep(0.1 * 2 ** attempt)
+                except Exception:
+                    # Never let a failed batch kill the flusher
+                    logger.exception("Failed to write %d audit log entries", len(rows))
+                    break
+
+    @staticmethod
+    def _write_rows(bind: Engine, rows: List[Dict[str, Any]]):
+        with bind.begin() as conn:
+            conn.execute(insert(AuditLog), rows)
+
+
+audit_writer = AuditWriter()
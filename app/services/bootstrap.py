@@ -0,0 +1,42 @@
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Engine
+
+from app.auth.jwt import get_password_hash
+from app.database import Base, normalize_sqlite_timestamps, startup_lock
+from app.models.setting import AppSetting
+from app.models.user import User
+
+# app_settings key recorded once the stored timestamps have been normalized
+TIMESTAMPS_NORMALIZED_KEY = "sqlite_timestamps_normalized"
+
+def initialize_database(engine: Engine):
+    """
+    Create missing tables and indexes. Safe to run from every worker at once:
+    the work happens under startup_lock, so later workers find it done.
+    """
+    with startup_lock(engine) as conn:
+        Base.metadata.create_all(bind=conn)
+        # create_all skips existing tables, so add indexes introduced after a table was created
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+        # One-time fix for rows written by older code; range filters and keyset
+        # cursors compare timestamps as text on SQLite. The updates scan whole
+        # tables under the write lock, so later startups skip them.
+        if conn.scalar(select(AppSetting.value).where(AppSetting.key == TIMESTAMPS_NORMALIZED_KEY)) is None:
+            normalize_sqlite_timestamps(conn, "audit_logs")
+            normalize_sqlite_timestamps(conn, "diagnostics")
+            conn.execute(insert(AppSetting).values(key=TIMESTAMPS_NORMALIZED_KEY, value="1"))
+
+def create_default_admin(engine: Engine) -> bool:
+    """Create the admin/admin user on an empty database; True if it was created"""
+    with startup_lock(engine) as conn:
+        # Counting under the lock makes count-then-insert safe across workers
+        if conn.scalar(select(func.count()).select_from(User)):
+            return False
+        conn.execute(insert(User).values(
+            username="admin",
+            email="admin@mimark.es",
+            hashed_password=get_password_hash("admin")
+        ))
+        return True
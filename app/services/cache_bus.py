@@ -0,0 +1,159 @@
+"""
+Cross-worker cache invalidation.
+
+Each worker process keeps its own in-memory caches (principal cache,
+scoring model). When one worker changes something another worker may have
+cached, it publishes an invalidation: a row in cache_invalidations. Every
+worker polls the table every CACHE_INVALIDATION_POLL_INTERVAL seconds and
+runs the handlers subscribed to that cache name. The publishing worker
+updates its own cache itself and skips its own rows when polling.
+
+Polls select by created_at rather than by id: ids are handed out when a
+row is inserted, so on PostgreSQL a row can become visible after a row with
+a higher id. Each poll re-reads the last CACHE_INVALIDATION_OVERLAP seconds
+before the newest message seen and skips ids it has already handled.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, run_db
+from app.models.cache_invalidation import CacheInvalidation
+
+logger = logging.getLogger(__name__)
+
+# Seconds between polls; 0 disables cross-worker invalidation
+CACHE_INVALIDATION_POLL_INTERVAL = float(os.environ.get("CACHE_INVALIDATION_POLL_INTERVAL", "2"))
+# Messages older than this are deleted; workers that were down that long rebuild their caches anyway
+CACHE_INVALIDATION_RETENTION = timedelta(seconds=float(os.environ.get("CACHE_INVALIDATION_RETENTION", "3600")))
+# How far back each poll looks for messages that committed late; longer than any publish transaction
+CACHE_INVALIDATION_OVERLAP = timedelta(seconds=float(os.environ.get("CACHE_INVALIDATION_OVERLAP", "60")))
+
+Handler = Callable[[Optional[str]], None]
+
+
+class CacheBus:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        poll_interval: float = CACHE_INVALIDATION_POLL_INTERVAL,
+        overlap: timedelta = CACHE_INVALIDATION_OVERLAP,
+    ):
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.overlap = overlap
+        self.handlers: Dict[str, List[Handler]] = {}
+        # Newest created_at handled, and the ids handled within overlap of it
+        self.watermark: Optional[datetime] = None
+        self._seen: Dict[int, datetime] = {}
+        self._own_ids: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, cache: str, handler: Handler):
+        """Call handler(key) whenever `cache` is invalidated; key None means everything"""
+        self.handlers.setdefault(cache, []).append(handler)
+
+    def _apply(self, cache: str, key: Optional[str]):
+        for handler in self.handlers.get(cache, []):
+            try:
+                handler(key)
+            except Exception:
+                logger.exception("Cache invalidation handler for %s failed", cache)
+
+    def publish_sync(self, cache: str, key: Optional[str] = None):
+        """Tell the other workers to invalidate `key` (None for all) of `cache`"""
+        with self.session_factory() as db:
+            message_id = db.execute(
+                insert(CacheInvalidation).values(cache=cache, key=key).returning(CacheInvalidation.id)
+            ).scalar()
+            db.commit()
+        self._own_ids.add(message_id)
+
+    async def publish(self, cache: str, key: Optional[str] = None):
+        await run_db(self.publish_sync, cache, key)
+
+    def poll(self) -> int:
+        """Apply messages published since the last poll; returns how many new ones were read"""
+        query = select(
+            CacheInvalidation.id, CacheInvalidation.cache, CacheInvalidation.key, CacheInvalidation.created_at
+        ).order_by(CacheInvalidation.id)
+        if self.watermark is not None:
+            query = query.where(CacheInvalidation.created_at >= self.watermark - self.overlap)
+        with self.session_factory() as db:
+            messages = db.execute(query).all()
+
+        count = 0
+        for message_id, cache, key, created_at in messages:
+            if message_id in self._seen:
+                continue
+            count += 1
+            self._seen[message_id] = created_at
+            if self.watermark is None or created_at > self.watermark:
+                self.watermark = created_at
+            if message_id in self._own_ids:
+                self._own_ids.discard(message_id)
+                continue
+            self._apply(cache, key)
+
+        # Ids that fell out of the window are never selected again
+        if self.watermark is not None:
+            cutoff = self.watermark - self.overlap
+            self._seen = {message_id: created_at for message_id, created_at in self._seen.items() if created_at >= cutoff}
+        return count
+
+    def prune(self):
+        with self.session_factory() as db:
+            db.execute(delete(CacheInvalidation).where(
+                CacheInvalidation.created_at < datetime.utcnow() - CACHE_INVALIDATION_RETENTION
+            ))
+            db.commit()
+
+    def _skip_existing(self):
+        """Mark the messages already in the table as handled"""
+        with self.session_factory() as db:
+            latest = db.scalar(select(func.max(CacheInvalidation.created_at)))
+            if latest is None:
+                return
+            recent = db.execute(
+                select(CacheInvalidation.id, CacheInvalidation.created_at)
+                .where(CacheInvalidation.created_at >= latest - self.overlap)
+            ).all()
+        self.watermark = latest
+        self._seen = dict(recent)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Start polling from the newest message; older ones predate our caches"""
+        if self.running or self.poll_interval <= 0:
+            return
+        await run_db(self._skip_existing)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        polls = 0
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await run_db(self.poll)
+                polls += 1
+                # Roughly every 10 minutes at the default interval
+                if polls % 300 == 0:
+                    await run_db(self.prune)
+            except Exception:
+                logger.exception("Polling cache invalidations failed")
+
+
+cache_bus = CacheBus()
@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.diagnostic import Diagnostic
+
+EXPORT_COLUMNS = ["id", "identifier", "timestamp", "protein1", "protein2", "protein3", "result"]
+# Rows fetched per round trip and serialized per yielded chunk
+EXPORT_BATCH_SIZE = 1000
+
+
+def filter_diagnostics(
+    stmt,
+    user_id: int,
+    result: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+):
+    """Restrict a diagnostics select to one user's rows and the given filters"""
+    stmt = stmt.where(Diagnostic.user_id == user_id)
+    if result:
+        stmt = stmt.where(Diagnostic.result == result)
+    if start_date:
+        stmt = stmt.where(Diagnostic.timestamp >= start_date)
+    if end_date:
+        stmt = stmt.where(Diagnostic.timestamp <= end_date)
+    return stmt
+
+
+def _csv_chunks(rows) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for partition in rows.partitions():
+        writer.writerows(partition)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _ndjson_chunks(rows) -> Iterator[str]:
+    for partition in rows.partitions():
+        lines = []
+        for row in partition:
+            record = dict(zip(EXPORT_COLUMNS, row))
+            record["timestamp"] = record["timestamp"].isoformat() if record["timestamp"] else None
+            lines.append(json.dumps(record))
+        yield "\n".join(lines) + "\n"
+
+
+def iter_export(
+    db: Session,
+    user_id: int,
+    export_format: str = "csv",
+    compress: bool = False,
+    **filters,
+) -> Iterator[bytes]:
+    """
+    Yield the user's diagnostics as CSV or NDJSON bytes, oldest first.
+
+    Rows are streamed from the database EXPORT_BATCH_SIZE at a time with
+    yield_per and encoded (and optionally gzip-compressed) per batch, so
+    memory use does not grow with the number of rows. Blocking generator,
+    iterate it from a worker thread.
+    """
+    stmt = filter_diagnostics(
+        select(*(getattr(Diagnostic, column) for column in EXPORT_COLUMNS)), user_id, **filters
+    ).order_by(Diagnostic.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    rows = db.execute(stmt)
+    chunks = _csv_chunks(rows) if export_format == "csv" else _ndjson_chunks(rows)
+
+    if not compress:
+        for chunk in chunks:
+            yield chunk.encode("utf-8")
+        return
+
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,147 @@
+import codecs
+import csv
+import json
+import os
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.models.diagnostic import Diagnostic
+from app.schemas.diagnostic import DiagnosticCreate
+
+# Largest number of rows accepted in one batch request or upload
+DIAGNOSTIC_BATCH_LIMIT = int(os.environ.get("DIAGNOSTIC_BATCH_LIMIT", "10000"))
+
+# Identifiers per IN (...) lookup, well under SQLite's bound parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+
+class BatchTooLarge(Exception):
+    pass
+
+
+def upload_format(filename: str = "", content_type: str = "") -> str:
+    """Format of an upload: csv for a .csv name or a CSV content type, else ndjson"""
+    if filename.lower().endswith(".csv") or "csv" in (content_type or ""):
+        return "csv"
+    return "ndjson"
+
+
+def parse_upload(fileobj: BinaryIO, file_format: str = "ndjson") -> Iterator[Any]:
+    """
+    Yield raw rows from an uploaded CSV (header row with identifier,
+    protein1, protein2, protein3) or NDJSON file. Lines that are not valid
+    JSON are yielded as strings so they are reported as invalid rows.
+    """
+    # Decode line by line; SpooledTemporaryFile can't be wrapped in TextIOWrapper on 3.9
+    text = codecs.iterdecode(fileobj, "utf-8-sig")
+    if file_format == "csv":
+        yield from csv.DictReader(text)
+        return
+
+    for line in text:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield line
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+
+def existing_identifiers(db: Session, identifiers: List[str]) -> set:
+    """Return the subset of identifiers already stored, in a few set queries"""
+    found = set()
+    for start in range(0, len(identifiers), LOOKUP_CHUNK_SIZE):
+        chunk = identifiers[start:start + LOOKUP_CHUNK_SIZE]
+        found.update(db.scalars(select(Diagnostic.identifier).where(Diagnostic.identifier.in_(chunk))))
+    return found
+
+
+def ingest_diagnostics(
+    db: Session,
+    raw_rows: Iterator[Any],
+    user_id: int,
+    score: Callable[[List[DiagnosticCreate]], List[str]],
+) -> Dict[str, Any]:
+    """
+    Validate, de-duplicate, score and insert a batch of diagnostics.
+
+    Valid rows whose identifier is new are inserted in a single transaction;
+    every row gets an entry in `results` saying what happened to it. `score`
+    receives the valid rows and returns one result per row.
+    Blocking, call it through run_db.
+    """
+    results: List[Dict[str, Any]] = []
+    valid: List[tuple] = []  # (results index, DiagnosticCreate)
+
+    for index, raw in enumerate(raw_rows):
+        if index >= DIAGNOSTIC_BATCH_LIMIT:
+            raise BatchTooLarge(f"Batches are limited to {DIAGNOSTIC_BATCH_LIMIT} rows")
+        identifier = raw.get("identifier") if isinstance(raw, dict) else None
+        # Echoed back in the response, which only has room for a string
+        identifier = str(identifier) if isinstance(identifier, (str, int)) else None
+        entry = {"index": index, "identifier": identifier, "status": "invalid"}
+        results.append(entry)
+        if not isinstance(raw, dict):
+            entry["error"] = "Row is not an object"
+            continue
+        try:
+            valid.append((index, DiagnosticCreate.parse_obj(raw)))
+        except ValidationError as e:
+            entry["error"] = _validation_message(e)
+
+    # One set lookup for every identifier in the batch, plus repeats within it
+    stored = existing_identifiers(db, list({row.identifier for _, row in valid}))
+    seen = set()
+    to_insert = []
+    for index, row in valid:
+        if row.identifier in stored or row.identifier in seen:
+            results[index]["status"] = "duplicate"
+            results[index]["error"] = "Identifier already exists"
+            continue
+        seen.add(row.identifier)
+        to_insert.append((index, row))
+
+    if to_insert:
+        scores = score([row for _, row in to_insert])
+        values = [
+            {
+                "identifier": row.identifier,
+                "protein1": row.protein1,
+                "protein2": row.protein2,
+                "protein3": row.protein3,
+                "result": result,
+                "user_id": user_id,
+            }
+            for (_, row), result in zip(to_insert, scores)
+        ]
+        try:
+            inserted = db.execute(
+                insert(Diagnostic).returning(Diagnostic.id, Diagnostic.identifier),
+                values
+            ).all()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        ids = {identifier: diagnostic_id for diagnostic_id, identifier in inserted}
+
+        for (index, row), result in zip(to_insert, scores):
+            results[index].update(status="created", id=ids[row.identifier], result=result)
+
+    created = sum(1 for entry in results if entry["status"] == "created")
+    return {
+        "received": len(results),
+        "created": created,
+        "failed": len(results) - created,
+        "results": results,
+    }
@@ -0,0 +1,184 @@
+"""
+Request instrumentation.
+
+When METRICS_ENABLED is set, MetricsMiddleware opens a timing record for
+every request. SQL statements (through engine events), audit writes and
+bcrypt calls add their time to the record of the request they run in; the
+middleware then reports it as a Server-Timing header and aggregates it per
+route for the Prometheus-style /metrics endpoint, which only answers
+requests carrying METRICS_TOKEN. When disabled nothing is registered and
+timed() is a no-op.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "false").lower() == "true"
+# Bearer token the /metrics scraper must send; /metrics refuses every request when unset
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Upper bounds in seconds of the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Timing record of the request being handled; a dict so that worker threads
+# running with a copy of the context still add to the same record
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> Tuple[Dict[str, float], object]:
+    timings = {"sql_count": 0, "sql": 0.0, "audit": 0.0, "bcrypt": 0.0}
+    return timings, _request_timings.set(timings)
+
+
+def end_request(token):
+    _request_timings.reset(token)
+
+
+@contextmanager
+def timed(name: str):
+    """Add the time spent in the block to the current request's `name` timing"""
+    timings = _request_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] += time.perf_counter() - start
+
+
+def instrument_engine(engine: Engine):
+    """Count statements and SQL time per request with engine events"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        _record_statement(conn.info["query_start"].pop())
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        # after_cursor_execute doesn't run for a failed statement; pop its start
+        # here so the pooled connection's stack doesn't grow with every error
+        if context.connection is None or context.execution_context is None:
+            return
+        starts = context.connection.info.get("query_start")
+        if starts:
+            _record_statement(starts.pop())
+
+
+def _record_statement(start: float):
+    elapsed = time.perf_counter() - start
+    timings = _request_timings.get()
+    if timings is not None:
+        timings["sql_count"] += 1
+        timings["sql"] += elapsed
+
+
+class _RouteStats:
+    __slots__ = ("requests", "duration_sum", "buckets", "sql_count", "sql_seconds", "audit_seconds", "bcrypt_seconds")
+
+    def __init__(self):
+        self.requests = 0
+        self.duration_sum = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.audit_seconds = 0.0
+        self.bcrypt_seconds = 0.0
+
+
+class MetricsRegistry:
+    """Per-route aggregates of the request timing records"""
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str, int], _RouteStats] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, method: str, route: str, status: int, duration: float, timings: Dict[str, float]):
+        with self._lock:
+            stats = self._routes.get((method, route, status))
+            if stats is None:
+                stats = self._routes[(method, route, status)] = _RouteStats()
+            stats.requests += 1
+            stats.duration_sum += duration
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    stats.buckets[i] += 1
+            stats.sql_count += timings["sql_count"]
+            stats.sql_seconds += timings["sql"]
+            stats.audit_seconds += timings["audit"]
+            stats.bcrypt_seconds += timings["bcrypt"]
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    def render(self, extra: Optional[List[Tuple[str, str, str, float]]] = None) -> str:
+        """Prometheus text exposition format; extra adds (name, type, help, value) samples"""
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines: List[str] = []
+
+            def metric(name, kind, help_text, samples):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(samples)
+
+            def labels(method, route, status, **extra):
+                pairs = {"method": method, "route": route, "status": str(status), **extra}
+                return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs.items()) + "}"
+
+            histogram = []
+            for (method, route, status), stats in routes:
+                for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+                    histogram.append(f"womsoft_request_duration_seconds_bucket{labels(method, route, status, le=str(bound))} {count}")
+                histogram.append(f"womsoft_request_duration_seconds_bucket{labels(method, route, status, le='+Inf')} {stats.requests}")
+                histogram.append(f"womsoft_request_duration_seconds_sum{labels(method, route, status)} {stats.duration_sum:.6f}")
+                histogram.append(f"womsoft_request_duration_seconds_count{labels(method, route, status)} {stats.requests}")
+            metric("womsoft_request_duration_seconds", "histogram", "Handler time per route", histogram)
+
+            for name, attribute, help_text in (
+                ("womsoft_sql_statements_total", "sql_count", "SQL statements executed while handling requests"),
+                ("womsoft_sql_seconds_total", "sql_seconds", "Time spent executing SQL"),
+                ("womsoft_audit_write_seconds_total", "audit_seconds", "Time spent writing or queueing audit events"),
+                ("womsoft_bcrypt_seconds_total", "bcrypt_seconds", "Time spent hashing and verifying passwords"),
+            ):
+                samples = [
+                    f"{name}{labels(method, route, status)} {getattr(stats, attribute):.6g}"
+                    for (method, route, status), stats in routes
+                ]
+                metric(name, "counter", help_text, samples)
+
+        for name, kind, help_text, value in extra or []:
+            metric(name, kind, help_text, [f"{name} {value}"])
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def server_timing(duration: float, timings: Dict[str, float]) -> str:
+    """Server-Timing header value; durations in milliseconds"""
+    parts = [
+        f"app;dur={duration * 1000:.1f}",
+        f'db;dur={timings["sql"] * 1000:.1f};desc="{timings["sql_count"]} queries"',
+    ]
+    if timings["audit"]:
+        parts.append(f"audit;dur={timings['audit'] * 1000:.1f}")
+    if timings["bcrypt"]:
+        parts.append(f"bcrypt;dur={timings['bcrypt'] * 1000:.1f}")
+    return ", ".join(parts)
+
+
+metrics_registry = MetricsRegistry()
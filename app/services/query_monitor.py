@@ -0,0 +1,114 @@
+"""
+Slow-query log and N+1 detector.
+
+SLOW_QUERY_THRESHOLD_MS logs every statement slower than the threshold with
+its bound parameters and the route that issued it. N_PLUS_ONE_THRESHOLD
+logs a warning when one request runs the same statement (ignoring bound
+values and the length of IN lists) at least that many times, which is
+what a lazy-loaded relationship accessed in a loop looks like. Both are off
+when unset or 0.
+"""
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import Scope
+
+logger = logging.getLogger("app.sql")
+
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", "0") or 0)
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("N_PLUS_ONE_THRESHOLD", "0") or 0)
+QUERY_MONITOR_ENABLED = SLOW_QUERY_THRESHOLD_MS > 0 or N_PLUS_ONE_THRESHOLD > 0
+
+# Longest parameter repr written to the slow-query log
+MAX_PARAMS_LENGTH = 500
+
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)|\(\s*%\(\w+\)s(?:\s*,\s*%\(\w+\)s)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# {"scope": ASGI scope, "statements": Counter} of the request being handled
+_current_request: ContextVar[Optional[Dict[str, Any]]] = ContextVar("query_monitor_request", default=None)
+
+
+def start_request(scope: Scope) -> Dict[str, Any]:
+    request = {"scope": scope, "statements": Counter()}
+    request["token"] = _current_request.set(request)
+    return request
+
+
+def end_request(request: Dict[str, Any]):
+    _current_request.reset(request.pop("token"))
+
+
+def normalize_statement(statement: str) -> str:
+    """Collapse whitespace and expanded IN lists so repeats compare equal"""
+    return _IN_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def describe_request(scope: Optional[Scope]) -> str:
+    if scope is None:
+        return "outside a request"
+    route = getattr(scope.get("route"), "path", None) or scope.get("path")
+    return f"{scope.get('method')} {route}"
+
+
+def monitor_engine(
+    engine: Engine,
+    slow_query_ms: float = SLOW_QUERY_THRESHOLD_MS,
+    track_repeats: bool = N_PLUS_ONE_THRESHOLD > 0,
+):
+    """Register the slow-query and repeated-statement listeners on an engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_monitor_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        _finish_statement(conn.info["query_monitor_start"].pop(), statement, parameters, slow_query_ms, track_repeats)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        # after_cursor_execute doesn't run for a failed statement; pop its start
+        # here so the pooled connection's stack doesn't grow with every error
+        if context.connection is None or context.execution_context is None:
+            return
+        starts = context.connection.info.get("query_monitor_start")
+        if starts:
+            _finish_statement(
+                starts.pop(), context.statement, context.parameters, slow_query_ms, track_repeats, failed=True
+            )
+
+
+def _finish_statement(start: float, statement, parameters, slow_query_ms: float, track_repeats: bool, failed: bool = False):
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    request = _current_request.get()
+
+    if slow_query_ms and elapsed_ms >= slow_query_ms:
+        params = repr(parameters)
+        if len(params) > MAX_PARAMS_LENGTH:
+            params = params[:MAX_PARAMS_LENGTH] + "..."
+        logger.warning(
+            "Slow query (%.1f ms%s) on %s: %s params=%s",
+            elapsed_ms, ", failed" if failed else "", describe_request(request and request["scope"]),
+            statement, params
+        )
+
+    if track_repeats and request is not None:
+        request["statements"][normalize_statement(statement)] += 1
+
+
+def report_repeats(request: Dict[str, Any], threshold: int = N_PLUS_ONE_THRESHOLD):
+    """Warn about statements the request ran at least threshold times"""
+    for statement, count in request["statements"].items():
+        if count >= threshold:
+            logger.warning(
+                "Possible N+1 on %s: statement ran %d times: %s",
+                describe_request(request["scope"]), count, statement
+            )
@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.diagnostic import Diagnostic
+from app.models.setting import AppSetting
+from app.services.scoring import ScoringEngine, scoring_engine
+
+logger = logging.getLogger(__name__)
+
+# app_settings key holding the progress of an unfinished re-score
+RESCORE_CHECKPOINT_KEY = "diagnostic_rescore_checkpoint"
+# Rows read, scored and updated per transaction
+RESCORE_CHUNK_SIZE = int(os.environ.get("RESCORE_CHUNK_SIZE", "2000"))
+# Seconds to sleep between chunks so live requests can take the write lock
+RESCORE_PAUSE = float(os.environ.get("RESCORE_PAUSE", "0.05"))
+# app_settings key of the lease that lets one process at a time run a re-score
+RESCORE_LOCK_KEY = "diagnostic_rescore_lock"
+# Seconds a lease lasts without renewal; a crashed holder blocks new runs this long
+RESCORE_LOCK_TTL = float(os.environ.get("RESCORE_LOCK_TTL", "300"))
+
+
+class RescoreAlreadyRunning(Exception):
+    """Another worker process or script holds the re-score lease"""
+
+
+class RescoreJob:
+    """
+    Recalculate `result` for every diagnostic with the active scoring model.
+
+    Rows are read in id order one chunk at a time, scored with one vectorized
+    call, and only the rows whose result changed are updated. Each chunk's
+    updates and the checkpoint (last id done) commit in one short
+    transaction, so an interrupted job resumes after the last full chunk.
+
+    Only one process runs a job at a time: the job holds a lease in
+    app_settings, claimed and renewed with conditional UPDATEs. A table lock
+    or advisory lock would have to stay open for the whole run, blocking
+    SQLite writers; the lease only needs a row.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        engine: ScoringEngine = scoring_engine,
+        chunk_size: int = RESCORE_CHUNK_SIZE,
+        pause: float = RESCORE_PAUSE,
+    ):
+        self.session_factory = session_factory
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.status: Dict[str, Any] = {"state": "idle"}
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Value of the app_settings lease row while this job holds it
+        self._lease: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, restart: bool = False) -> bool:
+        """
+        Run in a background thread; False if a run is already in progress
+        here or in another process. Blocking, call it through run_db.
+        """
+        with self._lock:
+            if self.running:
+                return False
+            with self.session_factory() as db:
+                if not self._claim(db):
+                    return False
+            self.status = {"state": "starting"}
+            self._thread = threading.Thread(
+                target=self._run_logged, kwargs={"restart": restart}, name="diagnostic-rescore", daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def _run_logged(self, restart: bool):
+        try:
+            self.run(restart=restart)
+        except Exception as e:
+            logger.exception("Diagnostic re-score failed")
+            self.status = {**self.status, "state": "failed", "error": str(e)}
+
+    def run(self, restart: bool = False, progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Run to completion in the calling thread and return the final status"""
+        if self.engine.model is None:
+            self.engine.load()
+        db = self.session_factory()
+        try:
+            # start() claims the lease before handing over to the thread
+            if self._lease is None and not self._claim(db):
+                raise RescoreAlreadyRunning("A re-score is already running in another process")
+            checkpoint = None if restart else _load_checkpoint(db)
+            if checkpoint is None:
+                # Rows created after this point are already scored by the new model
+                max_id = db.scalar(select(Diagnostic.id).order_by(Diagnostic.id.desc()).limit(1)) or 0
+                checkpoint = {"last_id": 0, "max_id": max_id, "processed": 0, "changed": 0}
+            total = db.scalar(
+                select(func.count()).select_from(Diagnostic).where(Diagnostic.id <= checkpoint["max_id"])
+            )
+            started = time.perf_counter()
+            processed_at_start = checkpoint["processed"]
+            self.status = {"state": "running", "total": total, "model": self.engine.config, **checkpoint}
+
+            while checkpoint["last_id"] < checkpoint["max_id"]:
+                rows = db.execute(
+                    select(Diagnostic.id, Diagnostic.protein1, Diagnostic.protein2, Diagnostic.protein3, Diagnostic.result)
+                    .where(Diagnostic.id > checkpoint["last_id"], Diagnostic.id <= checkpoint["max_id"])
+                    .order_by(Diagnostic.id)
+                    .limit(self.chunk_size)
+                ).all()
+                # End the read transaction before writing; upgrading a WAL read
+                # snapshot to a write fails if another writer committed meanwhile
+                db.rollback()
+                if not rows:
+                    break
+
+                ids, protein1, protein2, protein3, old_results = zip(*rows)
+                new_results = self.engine.score(protein1, protein2, protein3)
+                changes = [
+                    {"id": row_id, "result": new}
+                    for row_id, old, new in zip(ids, old_results, new_results)
+                    if old != new
+                ]
+
+                checkpoint["last_id"] = ids[-1]
+                checkpoint["processed"] += len(rows)
+                checkpoint["changed"] += len(changes)
+                if changes:
+                    # ORM bulk UPDATE by primary key: one executemany
+                    db.execute(update(Diagnostic), changes)
+                db.merge(AppSetting(key=RESCORE_CHECKPOINT_KEY, value=json.dumps(checkpoint)))
+                lease = self._renew(db)
+                db.commit()
+                self._lease = lease
+
+                elapsed = time.perf_counter() - started
+                self.status = {
+                    **self.status,
+                    **checkpoint,
+                    "rows_per_second": round((checkpoint["processed"] - processed_at_start) / elapsed, 1) if elapsed else None,
+                }
+                if progress:
+                    progress(self.status)
+                if self.pause:
+                    time.sleep(self.pause)
+
+            # Finished, nothing to resume
+            setting = db.get(AppSetting, RESCORE_CHECKPOINT_KEY)
+            if setting is not None:
+                db.delete(setting)
+                db.commit()
+            self.status = {**self.status, "state": "finished"}
+            return self.status
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            self._release(db)
+            db.close()
+
+    def _new_lease(self) -> str:
+        return json.dumps({
+            "owner": f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}",
+            "expires_at": (datetime.utcnow() + timedelta(seconds=RESCORE_LOCK_TTL)).isoformat(),
+        })
+
+    def _swap_lease(self, db: Session, old: Optional[str], new: Optional[str]) -> bool:
+        """Replace the lease row's value only if it still is `old`"""
+        current = AppSetting.value.is_(None) if old is None else AppSetting.value == old
+        result = db.execute(
+            update(AppSetting)
+            .where(AppSetting.key == RESCORE_LOCK_KEY, current)
+            .values(value=new)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    def _claim(self, db: Session) -> bool:
+        """Take the lease if it is free or expired; commits"""
+        lease = self._new_lease()
+        setting = db.get(AppSetting, RESCORE_LOCK_KEY)
+        if setting is None:
+            # First run on this database: the insert is the claim
+            db.add(AppSetting(key=RESCORE_LOCK_KEY, value=lease))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                return False
+        else:
+            held = setting.value
+            if held and datetime.fromisoformat(json.loads(held)["expires_at"]) > datetime.utcnow():
+                db.rollback()
+                return False
+            claimed = self._swap_lease(db, held, lease)
+            db.commit()
+            if not claimed:
+                return False
+        self._lease = lease
+        return True
+
+    def _renew(self, db: Session) -> str:
+        """Extend the lease in the current transaction; returns its new value"""
+        lease = self._new_lease()
+        if not self._swap_lease(db, self._lease, lease):
+            raise RescoreAlreadyRunning("The re-score lease expired and was taken by another process")
+        return lease
+
+    def _release(self, db: Session):
+        if self._lease is None:
+            return
+        try:
+            db.rollback()
+            self._swap_lease(db, self._lease, None)
+            db.commit()
+        except Exception:
+            # It expires after RESCORE_LOCK_TTL anyway
+            logger.exception("Releasing the re-score lease failed")
+        self._lease = None
+
+
+def _load_checkpoint(db: Session) -> Optional[Dict[str, Any]]:
+    setting = db.get(AppSetting, RESCORE_CHECKPOINT_KEY)
+    return json.loads(setting.value) if setting and setting.value else None
+
+
+rescore_job = RescoreJob(SessionLocal)
@@ -0,0 +1,140 @@
+"""
+Diagnostic scoring engine.
+
+A scoring model turns an (n, 3) array of protein1/2/3 values into n result
+labels in one NumPy call, so single creates and bulk ingestion share the
+same code path. The active model is described by a JSON file named by
+SCORING_MODEL_PATH, e.g.
+
+    {"type": "linear", "weights": [0.4, 0.3, 0.3], "bias": 0.0,
+     "threshold": 1.0, "labels": ["Negative", "Positive"]}
+
+and is loaded once at startup. ScoringEngine.reload() re-reads the file and
+swaps the model in without a restart; without a file every sample scores
+"Positive". Custom models register a type with @register_model or are named
+by import path with {"class": "package.module:ClassName", ...}.
+"""
+import importlib
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+
+SCORING_MODEL_PATH = os.environ.get("SCORING_MODEL_PATH", "")
+
+MODEL_TYPES: Dict[str, Callable[[Dict[str, Any]], "ScoringModel"]] = {}
+
+
+def register_model(name: str):
+    """Class decorator making a model available as {"type": name}"""
+    def decorator(cls):
+        MODEL_TYPES[name] = cls
+        return cls
+    return decorator
+
+
+class ScoringModel(ABC):
+    """Base class for scoring models"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+
+    @abstractmethod
+    def score(self, proteins: np.ndarray) -> np.ndarray:
+        """Map an (n, 3) float array to an array of n result labels"""
+
+
+@register_model("constant")
+class ConstantModel(ScoringModel):
+    """Every sample gets the same result (the original placeholder logic)"""
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.result = config.get("result", "Positive")
+
+    def score(self, proteins: np.ndarray) -> np.ndarray:
+        return np.full(len(proteins), self.result, dtype=object)
+
+
+@register_model("linear")
+class LinearModel(ScoringModel):
+    """Positive when weights . proteins + bias reaches the threshold"""
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.weights = np.asarray(config["weights"], dtype=np.float64)
+        if self.weights.shape != (3,):
+            raise ValueError("linear model needs exactly 3 weights")
+        self.bias = float(config.get("bias", 0.0))
+        self.threshold = float(config.get("threshold", 0.0))
+        negative, positive = config.get("labels", ["Negative", "Positive"])
+        self.labels = np.array([negative, positive], dtype=object)
+
+    def score(self, proteins: np.ndarray) -> np.ndarray:
+        values = proteins @ self.weights + self.bias
+        return self.labels[(values >= self.threshold).astype(np.intp)]
+
+
+DEFAULT_MODEL_CONFIG = {"type": "constant", "result": "Positive"}
+
+
+def build_model(config: Dict[str, Any]) -> ScoringModel:
+    if "class" in config:
+        module_name, _, class_name = config["class"].partition(":")
+        model_class = getattr(importlib.import_module(module_name), class_name)
+    else:
+        model_type = config.get("type", "constant")
+        if model_type not in MODEL_TYPES:
+            raise ValueError(f"Unknown scoring model type: {model_type}")
+        model_class = MODEL_TYPES[model_type]
+    return model_class(config)
+
+
+class ScoringEngine:
+    """Holds the active scoring model and scores batches of samples"""
+
+    def __init__(self, model_path: str = SCORING_MODEL_PATH):
+        self.model_path = model_path
+        self.model = None
+        self.config = None
+        self._lock = threading.Lock()
+
+    def load(self) -> ScoringModel:
+        """
+        (Re)load the model from model_path. The new model is built completely
+        before it replaces the old one, so a bad file leaves the old model in
+        place and in-flight requests never see a half-loaded model.
+        """
+        with self._lock:
+            if self.model_path:
+                with open(self.model_path) as f:
+                    config = json.load(f)
+            else:
+                config = DEFAULT_MODEL_CONFIG
+            model = build_model(config)
+            self.config, self.model = config, model
+            return model
+
+    reload = load
+
+    def describe(self) -> Dict[str, Any]:
+        return {"path": self.model_path or None, "config": self.config}
+
+    def score(self, protein1: Sequence[float], protein2: Sequence[float], protein3: Sequence[float]) -> List[str]:
+        """Score n samples given as three equal-length sequences"""
+        model = self.model or self.load()
+        proteins = np.column_stack([
+            np.asarray(protein1, dtype=np.float64),
+            np.asarray(protein2, dtype=np.float64),
+            np.asarray(protein3, dtype=np.float64),
+        ])
+        return model.score(proteins).tolist()
+
+    def score_one(self, protein1: float, protein2: float, protein3: float) -> str:
+        return self.score([protein1], [protein2], [protein3])[0]
+
+
+scoring_engine = ScoringEngine()
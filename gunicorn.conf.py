@@ -0,0 +1,14 @@
+# Multi-worker deployment: gunicorn -c gunicorn.conf.py app.main:app
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+
+# Import the app in every worker rather than once in the master: database
+# engines, the audit writer and the password hashing pool must not be
+# shared across fork. Startup initialization is lock-protected instead.
+preload_app = False
@@ -5,8 +5,8 @@ import csv
 import json
 from datetime import datetime, timedelta
 import gzip
-import shutil
 import sys
+import argparse
 import logging
 
 # Setup logging
@@ -25,130 +25,253 @@ sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
 
 # Import the database URL
 from app.database import SQLALCHEMY_DATABASE_URL
+from app.services.audit_archive import AUDIT_ARCHIVE_DIR, ColumnarArchiveWriter, drop_partitions_before
+from app.services.audit_partitions import PARTITION_PREFIX, next_month, partition_month
 
-def backup_audit_logs():
+# app_settings key holding the progress of an unfinished run
+CHECKPOINT_KEY = "audit_archive_checkpoint"
+
+def ensure_settings_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS app_settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+
+def set_setting(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO app_settings (key, value) VALUES (?, ?)", (key, value))
+
+def get_setting(conn, key):
+    row = conn.execute("SELECT value FROM app_settings WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def load_checkpoint(conn):
+    """Return the checkpoint of a crashed run, or None"""
+    raw = get_setting(conn, CHECKPOINT_KEY)
+    return json.loads(raw) if raw else None
+
+class CsvArchive:
+    """Gzip'd CSV archive file, one per run"""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.file = gzip.open(path, "wt", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        # Write header
+        self.writer.writerow(columns)
+
+    def writerow(self, row):
+        self.writer.writerow(row)
+
+    def flush(self):
+        self.file.flush()
+        self.file.buffer.flush()
+        self.file.buffer.fileobj.flush()
+        os.fsync(self.file.buffer.fileobj.fileno())
+
+    def close(self):
+        self.file.close()
+
+def open_archive(archive_format, backup_dir, columns, table="audit_logs"):
+    if archive_format == "columnar":
+        return ColumnarArchiveWriter(AUDIT_ARCHIVE_DIR, columns)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return CsvArchive(f"{backup_dir}/{table}_{timestamp}.csv.gz", columns)
+
+def archive_range(conn, writer, last_id, max_id, cutoff_str, chunk_size):
     """
-    Backup audit logs older than 30 days to CSV and compress them
+    Stream the next chunk of archivable rows after last_id into the writer.
+    Returns (rows written, highest id written).
     """
+    cursor = conn.execute("""
+        SELECT * FROM audit_logs
+        WHERE id > ? AND id <= ? AND timestamp < ?
+        ORDER BY id
+        LIMIT ?
+    """, (last_id, max_id, cutoff_str, chunk_size))
+
+    count = 0
+    for row in cursor:
+        writer.writerow(row)
+        count += 1
+        last_id = row[0]
+    return count, last_id
+
+def archive_expired_partitions(conn, archive_format, backup_dir, cutoff_str):
+    """
+    Archive and drop the monthly audit_logs partitions whose whole month is
+    older than the cutoff. A partition is dropped only after its rows are
+    flushed to the archive; a crash in between archives it again on the next
+    run (at-least-once). Returns the number of rows archived.
+    """
+    cutoff = datetime.strptime(cutoff_str, "%Y-%m-%d %H:%M:%S")
+    names = [
+        name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE ? ORDER BY name",
+            (PARTITION_PREFIX + "%",)
+        )
+        if partition_month(name) is not None and next_month(partition_month(name)) <= cutoff
+    ]
+    total = 0
+    for name in names:
+        columns = [col[1] for col in conn.execute(f"PRAGMA table_info({name})")]
+        archive = open_archive(archive_format, backup_dir, columns, table=name)
+        try:
+            count = 0
+            for row in conn.execute(f"SELECT * FROM {name} ORDER BY id"):
+                archive.writerow(row)
+                count += 1
+            archive.flush()
+        finally:
+            archive.close()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f"DROP TABLE {name}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        total += count
+        logger.info(f"Archived and dropped partition {name} ({count} logs)")
+    return total
+
+def backup_audit_logs(retention_days=30, chunk_size=5000, archive_format="csv"):
+    """
+    Archive audit logs older than retention_days and delete them from the
+    database: expired monthly partitions first, then any old rows still in
+    audit_logs. archive_format is "csv" for one gzip'd CSV per run or
+    "columnar" for the day-partitioned archive in app.services.audit_archive,
+    which the admin API can query.
+
+    Rows are streamed one id range at a time straight into the gzip stream.
+    Each range is deleted in a single short transaction that also records
+    the last archived id in app_settings, so a crashed run resumes where it
+    stopped. A crash between writing a range and deleting it means that range
+    is archived again on resume (at-least-once).
+    """
+    # The archiver works on the SQLite file directly
+    if not SQLALCHEMY_DATABASE_URL.startswith("sqlite:///"):
+        logger.error("Audit log backup only supports SQLite databases, not %s", SQLALCHEMY_DATABASE_URL.split(":", 1)[0])
+        return
+
     # Extract SQLite database path from the URL
     db_path = SQLALCHEMY_DATABASE_URL.replace("sqlite:///", "")
     if not os.path.exists(db_path):
         logger.error(f"Database file not found at {db_path}")
         return
-    
+
     # Create backup directory if it doesn't exist
     backup_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "audit_backups")
     os.makedirs(backup_dir, exist_ok=True)
-    
-    # Calculate cutoff date (30 days ago)
-    retention_days = 30
-    cutoff_date = datetime.now() - timedelta(days=retention_days)
-    cutoff_str = cutoff_date.strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Connect to database
+
+    # Autocommit mode; transactions are opened explicitly below
+    conn = sqlite3.connect(db_path, isolation_level=None)
     try:
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Check if app_settings table exists, create if not
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='app_settings'")
-        if not cursor.fetchone():
-            cursor.execute("""
-                CREATE TABLE app_settings (
-                    key TEXT PRIMARY KEY,
-                    value TEXT
-                )
-            """)
-            conn.commit()
-        
+        ensure_settings_table(conn)
+
+        checkpoint = load_checkpoint(conn)
+        if checkpoint:
+            # Resume with the cutoff of the interrupted run
+            cutoff_str = checkpoint["cutoff"]
+            last_id = checkpoint["last_id"]
+            logger.info(f"Resuming archive run from id {last_id} (cutoff {cutoff_str})")
+        else:
+            cutoff_date = datetime.now() - timedelta(days=retention_days)
+            cutoff_str = cutoff_date.strftime("%Y-%m-%d %H:%M:%S")
+            last_id = 0
+
+        # Closed months live in their own tables; expired ones go whole
+        archive_expired_partitions(conn, archive_format, backup_dir, cutoff_str)
+
+        # Upper id bound of the archivable rows, found through the timestamp index
+        max_id = conn.execute(
+            "SELECT max(id) FROM audit_logs WHERE timestamp < ?", (cutoff_str,)
+        ).fetchone()[0]
+        if max_id is None or max_id <= last_id:
+            logger.info("No audit logs to archive")
+            conn.execute("DELETE FROM app_settings WHERE key = ?", (CHECKPOINT_KEY,))
+            return
+
         # Set archiving flag to allow deletion via triggers
-        cursor.execute("BEGIN TRANSACTION")
-        cursor.execute("INSERT OR REPLACE INTO app_settings (key, value) VALUES ('archiving_in_progress', 'true')")
-        conn.commit()
-        
+        set_setting(conn, "archiving_in_progress", "true")
+
+        columns = [col[1] for col in conn.execute("PRAGMA table_info(audit_logs)")]
+        archive = open_archive(archive_format, backup_dir, columns)
+        archive_name = getattr(archive, "path", None) or archive.base_dir
+        total_archived = 0
+
         try:
-            # Get logs older than cutoff date
-            cursor.execute("""
-                SELECT * FROM audit_logs
-                WHERE timestamp < ?
-            """, (cutoff_str,))
-            
-            logs = cursor.fetchall()
-            log_count = len(logs)
-            
-            if log_count == 0:
+            try:
+                while True:
+                    range_start = last_id
+                    count, last_id = archive_range(conn, archive, last_id, max_id, cutoff_str, chunk_size)
+                    if count == 0:
+                        break
+
+                    # Make the range durable in the archive before deleting it
+                    archive.flush()
+
+                    # Delete the range and advance the checkpoint atomically
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        conn.execute(
+                            "DELETE FROM audit_logs WHERE id > ? AND id <= ? AND timestamp < ?",
+                            (range_start, last_id, cutoff_str)
+                        )
+                        set_setting(conn, CHECKPOINT_KEY, json.dumps({
+                            "cutoff": cutoff_str,
+                            "last_id": last_id,
+                            "archive": archive_name
+                        }))
+                        conn.execute("COMMIT")
+                    except Exception:
+                        conn.execute("ROLLBACK")
+                        raise
+
+                    total_archived += count
+                    logger.info(f"Archived and deleted {total_archived} logs (up to id {last_id})")
+            finally:
+                archive.close()
+
+            # Run finished, nothing to resume
+            conn.execute("DELETE FROM app_settings WHERE key = ?", (CHECKPOINT_KEY,))
+            if total_archived == 0:
+                if archive_format == "csv":
+                    os.remove(archive_name)
                 logger.info("No audit logs to archive")
                 return
-            
-            logger.info(f"Found {log_count} audit logs to archive")
-            
-            # Create a CSV file for backup
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            csv_file = f"{backup_dir}/audit_logs_{timestamp}.csv"
-            
-            with open(csv_file, 'w', newline='') as f:
-                writer = csv.writer(f)
-                
-                # Write header
-                column_names = [col[0] for col in cursor.description]
-                writer.writerow(column_names)
-                
-                # Write data
-                for log in logs:
-                    # Convert any JSON strings in details to readable format
-                    row_data = list(log)
-                    details_idx = column_names.index("details") if "details" in column_names else -1
-                    if details_idx >= 0 and row_data[details_idx]:
-                        try:
-                            # Just to make it more readable in the CSV
-                            details_dict = json.loads(row_data[details_idx])
-                            row_data[details_idx] = json.dumps(details_dict, ensure_ascii=False, indent=2)
-                        except:
-                            pass  # Keep original if can't parse
-                    
-                    writer.writerow(row_data)
-            
-            logger.info(f"Wrote audit logs to {csv_file}")
-            
-            # Compress the CSV file
-            with open(csv_file, 'rb') as f_in:
-                with gzip.open(f"{csv_file}.gz", 'wb') as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-            
-            # Remove the original CSV file
-            os.remove(csv_file)
-            logger.info(f"Compressed to {csv_file}.gz")
-            
-            # Get IDs to delete
-            log_ids = [log['id'] for log in logs]
-            
-            # Delete backed up logs from database
-            chunks = [log_ids[i:i+100] for i in range(0, len(log_ids), 100)]
-            total_deleted = 0
-            
-            for chunk in chunks:
-                placeholders = ','.join('?' for _ in chunk)
-                cursor.execute(f"DELETE FROM audit_logs WHERE id IN ({placeholders})", chunk)
-                conn.commit()
-                total_deleted += len(chunk)
-                logger.info(f"Deleted {total_deleted}/{log_count} logs")
-            
-            logger.info(f"Successfully archived and deleted {total_deleted} audit log entries")
-            
+            logger.info(f"Successfully archived and deleted {total_archived} audit log entries to {archive_name}")
+
         finally:
             # Reset the archiving flag
-            cursor.execute("INSERT OR REPLACE INTO app_settings (key, value) VALUES ('archiving_in_progress', 'false')")
-            conn.commit()
-            conn.close()
-            
+            set_setting(conn, "archiving_in_progress", "false")
+
     except Exception as e:
         logger.error(f"Error during audit log backup: {str(e)}")
         raise
+    finally:
+        conn.close()
+
+def expire_archive_partitions(retention_days):
+    """Drop columnar archive days older than retention_days"""
+    cutoff = (datetime.now() - timedelta(days=retention_days)).date()
+    dropped = drop_partitions_before(AUDIT_ARCHIVE_DIR, cutoff)
+    logger.info(f"Dropped {dropped} archived audit log entries older than {cutoff}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive and delete old audit logs")
+    parser.add_argument("--days", type=int, default=30, help="keep logs newer than this many days")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="rows per archive/delete transaction")
+    parser.add_argument("--format", choices=["csv", "columnar"], default="csv", help="archive file format")
+    parser.add_argument("--archive-retention-days", type=int, default=None,
+                        help="also drop columnar archive partitions older than this many days")
+    args = parser.parse_args()
     try:
-        backup_audit_logs()
+        backup_audit_logs(retention_days=args.days, chunk_size=args.chunk_size, archive_format=args.format)
+        if args.archive_retention_days is not None:
+            expire_archive_partitions(args.archive_retention_days)
     except Exception as e:
         logger.error(f"Audit backup script failed: {str(e)}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Measure how API throughput scales with the number of concurrent clients.
+
+Runs the app in-process against a temporary SQLite database and drives
+diagnostic creates and list reads at each concurrency level, e.g.
+
+    python scripts/benchmark_concurrency.py --levels 1 4 16 64 --requests 400
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+# Add the parent directory to the path so we can import our app modules
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+os.environ.setdefault("TEST_MODE", "true")
+
+import httpx
+from sqlalchemy import create_engine
+
+from app.main import app
+from app.database import Base, SessionLocal, apply_sqlite_profile
+
+
+def use_temporary_database(path):
+    """Point the app's session factory at a fresh SQLite file"""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    apply_sqlite_profile(engine)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal.configure(bind=engine)
+    return engine
+
+
+async def get_token(client):
+    credentials = {"username": "bench", "email": "bench@example.com", "password": "bench"}
+    await client.post("/api/auth/register", json=credentials)
+    response = await client.post(
+        "/api/auth/login",
+        data={"username": credentials["username"], "password": credentials["password"]}
+    )
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_level(client, headers, concurrency, total_requests):
+    """Fire total_requests mixed create/list calls with the given concurrency"""
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = 0
+
+    async def one_request(i):
+        nonlocal errors
+        async with semaphore:
+            if i % 2 == 0:
+                response = await client.post("/api/diagnostics/", headers=headers, json={
+                    "identifier": f"BENCH-{uuid.uuid4().hex[:12]}",
+                    "protein1": 1.0,
+                    "protein2": 2.0,
+                    "protein3": 3.0
+                })
+            else:
+                response = await client.get("/api/diagnostics/?limit=20", headers=headers)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_request(i) for i in range(total_requests)))
+    elapsed = time.perf_counter() - start
+    return total_requests / elapsed, errors
+
+
+async def main(levels, total_requests):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        use_temporary_database(os.path.join(tmpdir, "bench.db"))
+
+        await app.router.startup()
+        try:
+            async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+                headers = await get_token(client)
+                print(f"{'clients':>8} {'req/s':>10} {'errors':>8}")
+                for concurrency in levels:
+                    throughput, errors = await run_level(client, headers, concurrency, total_requests)
+                    print(f"{concurrency:>8} {throughput:>10.1f} {errors:>8}")
+        finally:
+            await app.router.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=400, help="requests per concurrency level")
+    args = parser.parse_args()
+    asyncio.run(main(args.levels, args.requests))
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""
+Measure the per-sample cost of the scoring engine at several batch sizes,
+next to a plain Python loop calling the engine once per sample, e.g.
+
+    python scripts/benchmark_scoring.py --sizes 1 100 100000
+    SCORING_MODEL_PATH=model.json python scripts/benchmark_scoring.py
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add the parent directory to the path so we can import our app modules
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from app.services.scoring import scoring_engine
+
+
+def best_of(repeats, func):
+    """Lowest wall time of several runs, in seconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(sizes, repeats):
+    scoring_engine.load()
+    print(f"model: {scoring_engine.describe()['config']}")
+    print(f"{'samples':>8} {'batch us/sample':>16} {'loop us/sample':>15}")
+    for size in sizes:
+        columns = [[random.uniform(0, 10) for _ in range(size)] for _ in range(3)]
+        batch = best_of(repeats, lambda: scoring_engine.score(*columns))
+        loop = best_of(repeats, lambda: [scoring_engine.score_one(*sample) for sample in zip(*columns)])
+        print(f"{size:>8} {batch / size * 1e6:>16.3f} {loop / size * 1e6:>15.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 100000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    main(args.sizes, args.repeats)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Compare the time to encode one page of list results on the default path
+(ORM objects validated through the orm_mode response models, as FastAPI
+does for read_diagnostics and get_audit_logs) and on the FAST_SERIALIZATION
+path (row tuples turned into dicts and encoded by FastJSONResponse), e.g.
+
+    python scripts/benchmark_serialization.py --page-size 100
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+# Add the parent directory to the path so we can import our app modules
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.models import user  # noqa: F401
+from app.models.audit import AuditLog
+from app.models.diagnostic import Diagnostic
+from app.responses import FastJSONResponse
+from app.routers.admin import AuditLogResponse
+from app.schemas.diagnostic import Diagnostic as DiagnosticSchema
+
+
+def seed(engine, page_size):
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(Diagnostic), [
+            {"identifier": f"BENCH-{i}", "user_id": 1, "protein1": i * 0.1, "protein2": 2.0,
+             "protein3": 3.0, "result": "Positive", "timestamp": now - timedelta(minutes=i)}
+            for i in range(page_size)
+        ])
+        conn.execute(insert(AuditLog), [
+            {"user_id": 1, "action": "view_diagnostics", "entity_type": "diagnostic", "entity_id": str(i),
+             "timestamp": now - timedelta(minutes=i), "details": '{"count": 100, "skip": 0, "limit": 100}',
+             "ip_address": "127.0.0.1", "user_agent": "benchmark"}
+            for i in range(page_size)
+        ])
+
+
+async def orm_path(model, objects):
+    field = create_response_field(name="response", type_=List[model])
+    content = await serialize_response(field=field, response_content=objects)
+    return JSONResponse(content=content).body
+
+
+def fast_path(columns, rows):
+    return FastJSONResponse(content=[dict(zip(columns, row)) for row in rows]).body
+
+
+def best_of(repeats, func):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(page_size, repeats):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    seed(engine, page_size)
+
+    loop = asyncio.new_event_loop()
+    print(f"{'endpoint':>12} {'orm_mode ms':>12} {'fast ms':>9} {'speedup':>8}")
+    with Session(engine) as db:
+        for name, model, schema in (("diagnostics", Diagnostic, DiagnosticSchema), ("audit-logs", AuditLog, AuditLogResponse)):
+            objects = db.scalars(select(model)).all()
+            columns = list(schema.__fields__)
+            rows = db.execute(select(*(getattr(model, column) for column in columns))).all()
+
+            assert loop.run_until_complete(orm_path(schema, objects)) and fast_path(columns, rows)
+            slow = best_of(repeats, lambda: loop.run_until_complete(orm_path(schema, objects)))
+            fast = best_of(repeats, lambda: fast_path(columns, rows))
+            print(f"{name:>12} {slow * 1000:>12.3f} {fast * 1000:>9.3f} {slow / fast:>7.1f}x")
+    loop.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+    main(args.page_size, args.repeats)
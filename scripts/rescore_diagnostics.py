@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""
+Recalculate the result of every stored diagnostic with the current scoring
+model (SCORING_MODEL_PATH). Interrupted runs resume from their checkpoint
+unless --restart is given, e.g.
+
+    SCORING_MODEL_PATH=model.json python scripts/rescore_diagnostics.py --chunk-size 5000
+"""
+import argparse
+import logging
+import os
+import sys
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("rescore_diagnostics")
+
+# Add the parent directory to the path so we can import our app modules
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from app.database import SessionLocal, engine
+from app.models.setting import AppSetting
+# Register every mapper the Diagnostic -> User relationships refer to
+from app.models import audit, user  # noqa: F401
+from app.services.rescore import RESCORE_CHUNK_SIZE, RESCORE_PAUSE, RescoreJob
+
+
+def report(status):
+    logger.info(
+        f"{status['processed']}/{status['total']} rows, {status['changed']} changed, "
+        f"{status['rows_per_second']} rows/s (up to id {status['last_id']})"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=RESCORE_CHUNK_SIZE, help="rows per update transaction")
+    parser.add_argument("--pause", type=float, default=RESCORE_PAUSE, help="seconds to sleep between chunks")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint of an interrupted run")
+    args = parser.parse_args()
+
+    # Make sure app_settings exists on databases created before it was added
+    AppSetting.__table__.create(bind=engine, checkfirst=True)
+    job = RescoreJob(SessionLocal, chunk_size=args.chunk_size, pause=args.pause)
+    try:
+        status = job.run(restart=args.restart, progress=report)
+        logger.info(f"Re-score finished: {status['processed']} rows checked, {status['changed']} changed")
+    except Exception as e:
+        logger.error(f"Re-score failed: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,25 @@
+import asyncio
+import os
+import pytest
+
+from tests.benchmark.harness import (
+    BENCHMARK_CONCURRENCY, BENCHMARK_REQUESTS, format_report, run_benchmarks, save_baselines
+)
+
+def pytest_collection_modifyitems(config, items):
+    """Benchmarks are slow; only run them when selected with -m benchmark"""
+    if "benchmark" in (config.getoption("-m") or "").replace("not benchmark", ""):
+        return
+    skip = pytest.mark.skip(reason="benchmarks only run with -m benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+@pytest.fixture(scope="session")
+def benchmark_results():
+    """Run every scenario once per session and print the report"""
+    results = asyncio.run(run_benchmarks(BENCHMARK_CONCURRENCY, BENCHMARK_REQUESTS))
+    print("\n" + format_report(results))
+    if os.environ.get("BENCHMARK_UPDATE_BASELINES", "").lower() == "true":
+        save_baselines(results, BENCHMARK_CONCURRENCY, BENCHMARK_REQUESTS)
+    return results
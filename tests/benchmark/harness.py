@@ -0,0 +1,240 @@
+"""
+Load generator for the benchmark suite.
+
+Runs the app in-process against a temporary SQLite database seeded with
+diagnostics and audit logs, drives each scenario at a fixed concurrency and
+reports latency percentiles and throughput per scenario. Used by
+test_api_benchmark.py; can also be run directly:
+
+    python -m tests.benchmark.harness --concurrency 8 --requests 200
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import create_engine, insert
+
+import app.database as app_database
+import app.main as app_main
+from app.auth.jwt import get_password_hash
+from app.database import SessionLocal, apply_sqlite_profile
+from app.main import app
+from app.models.audit import AuditLog
+from app.models.diagnostic import Diagnostic
+from app.models.user import User
+from app.services.audit_writer import audit_writer
+from app.services.bootstrap import initialize_database
+from app.services.metrics import METRICS_ENABLED, instrument_engine
+from app.services.query_monitor import QUERY_MONITOR_ENABLED, monitor_engine
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+BENCHMARK_CONCURRENCY = int(os.environ.get("BENCHMARK_CONCURRENCY", "8"))
+BENCHMARK_REQUESTS = int(os.environ.get("BENCHMARK_REQUESTS", "200"))
+
+ADMIN = {"username": "bench-admin", "password": "bench-admin"}
+USER = {"username": "bench-user", "password": "bench-user"}
+
+# Rows seeded before the run so list and browse pages are realistic
+SEED_DIAGNOSTICS = 2000
+SEED_AUDIT_LOGS = 20000
+
+
+@contextlib.contextmanager
+def temporary_database():
+    """
+    Point the app at a fresh, seeded SQLite file: the session factory as well
+    as the engine the startup hooks and background maintenance use
+    """
+    original_bind = SessionLocal.kw.get("bind")
+    original_engine = app_main.engine
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}", connect_args={"check_same_thread": False})
+        apply_sqlite_profile(engine)
+        # Same per-query work as the app's own engine
+        if QUERY_MONITOR_ENABLED:
+            monitor_engine(engine)
+        if METRICS_ENABLED:
+            instrument_engine(engine)
+        initialize_database(engine)
+        seed(engine)
+        SessionLocal.configure(bind=engine)
+        app_main.engine = app_database.engine = engine
+        try:
+            yield engine
+        finally:
+            app_main.engine = app_database.engine = original_engine
+            SessionLocal.configure(bind=original_bind)
+            engine.dispose()
+
+
+def seed(engine):
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        # is_admin treats user id 1 as the admin
+        conn.execute(insert(User), [
+            {"id": 1, "username": ADMIN["username"], "email": "bench-admin@example.com",
+             "hashed_password": get_password_hash(ADMIN["password"])},
+            {"id": 2, "username": USER["username"], "email": "bench-user@example.com",
+             "hashed_password": get_password_hash(USER["password"])},
+        ])
+        conn.execute(insert(Diagnostic), [
+            {"identifier": f"SEED-{i}", "user_id": 2, "protein1": 1.0, "protein2": 2.0, "protein3": 3.0,
+             "result": "Positive", "timestamp": now - timedelta(minutes=i)}
+            for i in range(SEED_DIAGNOSTICS)
+        ])
+        conn.execute(insert(AuditLog), [
+            {"user_id": 2, "action": "view_diagnostics", "entity_type": "diagnostic",
+             "timestamp": now - timedelta(seconds=i), "details": '{"count": 100}',
+             "ip_address": "127.0.0.1", "user_agent": "benchmark"}
+            for i in range(SEED_AUDIT_LOGS)
+        ])
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed, errors):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def drive(make_request, concurrency, total_requests):
+    """Send total_requests calls, at most concurrency at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await make_request(i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total_requests)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+async def login(client, credentials):
+    response = await client.post("/api/auth/login", data=credentials)
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_scenarios(client, concurrency, total_requests):
+    user_headers = await login(client, USER)
+    admin_headers = await login(client, ADMIN)
+    run_id = int(time.time() * 1000)
+    created_ids = []
+
+    async def create(i):
+        response = await client.post("/api/diagnostics/", headers=user_headers, json={
+            "identifier": f"BENCH-{run_id}-{i}", "protein1": 1.0, "protein2": 2.0, "protein3": 3.0
+        })
+        if response.status_code == 200:
+            created_ids.append(response.json()["id"])
+        return response
+
+    # bcrypt dominates login, so it gets fewer requests
+    scenarios = [
+        ("login", max(1, total_requests // 10),
+         lambda i: client.post("/api/auth/login", data=USER)),
+        ("create_diagnostic", total_requests, create),
+        ("list_diagnostics", total_requests,
+         lambda i: client.get("/api/diagnostics/?limit=100&order=desc", headers=user_headers)),
+        ("delete_diagnostic", None,
+         lambda i: client.delete(f"/api/diagnostics/{created_ids[i]}", headers=user_headers)),
+        ("admin_audit_logs", total_requests,
+         lambda i: client.get(f"/api/admin/audit-logs?limit=50&page={i % 5 + 1}", headers=admin_headers)),
+    ]
+
+    results = {}
+    for name, count, make_request in scenarios:
+        # Deletes remove the diagnostics created above
+        count = count if count is not None else len(created_ids)
+        results[name] = await drive(make_request, concurrency, count)
+    return results
+
+
+async def run_benchmarks(concurrency=BENCHMARK_CONCURRENCY, total_requests=BENCHMARK_REQUESTS):
+    with temporary_database():
+        await app.router.startup()
+        # Production writes audit events in the background; tests may run in sync mode
+        await audit_writer.start()
+        try:
+            async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+                return await run_scenarios(client, concurrency, total_requests)
+        finally:
+            await audit_writer.stop()
+            await app.router.shutdown()
+
+
+def machine_fingerprint():
+    """
+    Identifies where a baseline was recorded; timings only compare on the
+    same kind of machine. Set BENCHMARK_MACHINE to name a runner explicitly.
+    """
+    return os.environ.get("BENCHMARK_MACHINE") or (
+        f"{platform.system()}-{platform.machine()}-{os.cpu_count()}cpu-py{platform.python_version()}"
+    )
+
+
+def load_baselines():
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH) as f:
+        return json.load(f)
+
+
+def save_baselines(results, concurrency, total_requests):
+    with open(BASELINES_PATH, "w") as f:
+        json.dump({
+            "machine": machine_fingerprint(), "concurrency": concurrency, "requests": total_requests, "scenarios": results
+        }, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def format_report(results):
+    lines = [f"{'scenario':>18} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"]
+    for name, stats in results.items():
+        lines.append(
+            f"{name:>18} {stats['requests_per_second']:>9} {stats['p50_ms']:>9} "
+            f"{stats['p95_ms']:>9} {stats['p99_ms']:>9} {stats['errors']:>7}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=BENCHMARK_CONCURRENCY)
+    parser.add_argument("--requests", type=int, default=BENCHMARK_REQUESTS)
+    parser.add_argument("--update-baselines", action="store_true", help=f"write the results to {BASELINES_PATH}")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmarks(args.concurrency, args.requests))
+    print(format_report(results))
+    if args.update_baselines:
+        save_baselines(results, args.concurrency, args.requests)
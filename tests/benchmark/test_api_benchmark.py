@@ -0,0 +1,43 @@
+import os
+import pytest
+from tests.benchmark.harness import BENCHMARK_CONCURRENCY, BENCHMARK_REQUESTS, load_baselines, machine_fingerprint
+
+# How much slower than the stored baseline a scenario may get before failing
+BENCHMARK_TOLERANCE = float(os.environ.get("BENCHMARK_TOLERANCE", "2.0"))
+
+SCENARIOS = ["login", "create_diagnostic", "list_diagnostics", "delete_diagnostic", "admin_audit_logs"]
+
+@pytest.mark.benchmark
+class TestAPIBenchmark:
+    @pytest.mark.parametrize("scenario", SCENARIOS)
+    def test_scenario_within_baseline(self, benchmark_results, scenario):
+        """
+        Test that a scenario ran without errors and stayed within
+        BENCHMARK_TOLERANCE of its baseline p95 latency and throughput.
+        The comparison is skipped when the baseline comes from another
+        machine or another concurrency/request count.
+        """
+        stats = benchmark_results[scenario]
+        assert stats["errors"] == 0, f"{scenario}: {stats['errors']} failed requests"
+
+        baselines = load_baselines()
+        baseline = baselines.get("scenarios", {}).get(scenario)
+        if baseline is None:
+            pytest.skip(f"No baseline for {scenario}; run with BENCHMARK_UPDATE_BASELINES=true")
+        # Absolute timings from another machine or load level say nothing about this run
+        if baselines.get("machine") != machine_fingerprint():
+            pytest.skip(
+                f"Baseline recorded on {baselines.get('machine') or 'an unknown machine'}, not {machine_fingerprint()}; "
+                "run with BENCHMARK_UPDATE_BASELINES=true to record one here"
+            )
+        if (baselines.get("concurrency"), baselines.get("requests")) != (BENCHMARK_CONCURRENCY, BENCHMARK_REQUESTS):
+            pytest.skip(
+                f"Baseline recorded at concurrency {baselines.get('concurrency')} with {baselines.get('requests')} requests"
+            )
+
+        assert stats["p95_ms"] <= baseline["p95_ms"] * BENCHMARK_TOLERANCE, (
+            f"{scenario}: p95 {stats['p95_ms']} ms vs baseline {baseline['p95_ms']} ms"
+        )
+        assert stats["requests_per_second"] >= baseline["requests_per_second"] / BENCHMARK_TOLERANCE, (
+            f"{scenario}: {stats['requests_per_second']} req/s vs baseline {baseline['requests_per_second']} req/s"
+        )
@@ -1,15 +1,21 @@
 import os
 import pytest
+from datetime import datetime
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 
+# Write audit events inline so tests can read them right after a request
+os.environ.setdefault("AUDIT_WRITE_MODE", "sync")
+
 from app.main import app
 from app.database import Base, get_db
 from app.models.user import User
 from app.auth.jwt import get_password_hash, ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY  # Import the actual secret
 from app.models.audit import AuditLog  # Add this import
+from app.auth.principal_cache import principal_cache
+from app.services.audit_partitions import drop_partitions_before
 
 # Add this import to debug
 import logging
@@ -49,7 +55,8 @@ def db_engine():
     
     yield engine
     
-    # Clean up
+    # Clean up, including monthly audit partitions the test created
+    drop_partitions_before(engine, datetime.max)
     Base.metadata.drop_all(bind=engine)
 
 @pytest.fixture(scope="function")
@@ -77,6 +84,9 @@ def client(db_session):
     
     app.dependency_overrides[get_db] = override_get_db
     
+    # Users are recreated per test, so start with an empty principal cache
+    principal_cache.clear()
+    
     with TestClient(app) as client:
         yield client
     
@@ -1,4 +1,5 @@
 import pytest
+from sqlalchemy import text
 from fastapi.testclient import TestClient
 
 class TestDiagnosticAPI:
@@ -103,4 +104,187 @@ class TestDiagnosticAPI:
         
         # Verify all entries have a 'Positive' result
         for diagnostic in diagnostics:
-            assert diagnostic["result"] == "Positive"
\ No newline at end of file
+            assert diagnostic["result"] == "Positive"
+
+    def test_batch_create_reports_each_row(self, client, token_headers, db_session):
+        """
+        Test that a batch inserts new rows and reports duplicates and invalid rows.
+        """
+        client.post(
+            "/api/diagnostics/",
+            json={"identifier": "BATCH-1", "protein1": 1.0, "protein2": 2.0, "protein3": 3.0},
+            headers=token_headers
+        )
+        rows = [
+            {"identifier": "BATCH-1", "protein1": 1.0, "protein2": 2.0, "protein3": 3.0},
+            {"identifier": "BATCH-2", "protein1": 1.0, "protein2": 2.0, "protein3": 3.0},
+            {"identifier": "BATCH-2", "protein1": 4.0, "protein2": 5.0, "protein3": 6.0},
+            {"identifier": "BATCH-3", "protein1": "not a number", "protein2": 2.0, "protein3": 3.0},
+            {"identifier": "BATCH-4", "protein1": 1.0, "protein2": 2.0, "protein3": 3.0}
+        ]
+        response = client.post("/api/diagnostics/batch", json=rows, headers=token_headers)
+
+        assert response.status_code == 200
+        body = response.json()
+        assert (body["received"], body["created"], body["failed"]) == (5, 2, 3)
+        assert [row["status"] for row in body["results"]] == [
+            "duplicate", "created", "duplicate", "invalid", "created"
+        ]
+        assert "protein1" in body["results"][3]["error"]
+        assert body["results"][1]["result"] == "Positive"
+
+        from app.models.audit import AuditLog
+        events = db_session.query(AuditLog).filter(AuditLog.action == "create_diagnostics_batch").all()
+        assert len(events) == 1
+        assert '"created": 2' in events[0].details
+
+    def test_batch_create_rejects_non_scalar_identifiers(self, client, token_headers):
+        """
+        Test that an identifier that is not a string or number marks its row invalid.
+        """
+        rows = [
+            {"identifier": {"nested": "BATCH-X"}, "protein1": 1.0, "protein2": 2.0, "protein3": 3.0},
+            {"identifier": ["BATCH-Y"], "protein1": 1.0, "protein2": 2.0, "protein3": 3.0},
+            {"identifier": 42, "protein1": 1.0, "protein2": 2.0, "protein3": 3.0}
+        ]
+        response = client.post("/api/diagnostics/batch", json=rows, headers=token_headers)
+
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [row["status"] for row in results] == ["invalid", "invalid", "created"]
+        assert [row["identifier"] for row in results] == [None, None, "42"]
+
+    def test_upload_csv_and_ndjson(self, client, token_headers):
+        """
+        Test that CSV and NDJSON uploads go through the same batch ingest.
+        """
+        csv_body = "identifier,protein1,protein2,protein3\nCSV-1,1.5,2.5,3.5\nCSV-2,1,2,x\n"
+        response = client.post(
+            "/api/diagnostics/upload",
+            files={"file": ("plate.csv", csv_body, "text/csv")},
+            headers=token_headers
+        )
+        assert response.status_code == 200
+        assert [row["status"] for row in response.json()["results"]] == ["created", "invalid"]
+
+        ndjson_body = '{"identifier": "NDJ-1", "protein1": 1, "protein2": 2, "protein3": 3}\nnot json\n'
+        response = client.post(
+            "/api/diagnostics/upload",
+            files={"file": ("plate.ndjson", ndjson_body, "application/x-ndjson")},
+            headers=token_headers
+        )
+        assert response.status_code == 200
+        assert [row["status"] for row in response.json()["results"]] == ["created", "invalid"]
+
+    def test_upload_csv_content_type_is_audited_as_csv(self, client, token_headers, db_session):
+        """
+        Test that a CSV upload without a .csv name is parsed and audited as CSV.
+        """
+        import json
+        from app.models.audit import AuditLog
+
+        csv_body = "identifier,protein1,protein2,protein3\nTYPE-1,1.5,2.5,3.5\n"
+        response = client.post(
+            "/api/diagnostics/upload",
+            files={"file": ("plate", csv_body, "text/csv")},
+            headers=token_headers
+        )
+        assert [row["status"] for row in response.json()["results"]] == ["created"]
+
+        event = db_session.query(AuditLog).filter(AuditLog.action == "create_diagnostics_batch").one()
+        assert json.loads(event.details)["source"] == "csv"
+
+    def test_list_diagnostics_keyset_pagination_and_fields(self, client, token_headers):
+        """
+        Test cursor pagination, result filter and field projection on the list endpoint.
+        """
+        rows = [
+            {"identifier": f"PAGE-{i}", "protein1": 1.0, "protein2": 2.0, "protein3": 3.0}
+            for i in range(5)
+        ]
+        client.post("/api/diagnostics/batch", json=rows, headers=token_headers)
+
+        first = client.get("/api/diagnostics/?limit=2&order=desc", headers=token_headers)
+        assert [d["identifier"] for d in first.json()] == ["PAGE-4", "PAGE-3"]
+        cursor = first.headers["X-Next-Cursor"]
+
+        second = client.get(f"/api/diagnostics/?limit=2&order=desc&after={cursor}", headers=token_headers)
+        assert [d["identifier"] for d in second.json()] == ["PAGE-2", "PAGE-1"]
+
+        last = client.get(
+            f"/api/diagnostics/?limit=2&order=desc&after={second.headers['X-Next-Cursor']}",
+            headers=token_headers
+        )
+        assert [d["identifier"] for d in last.json()] == ["PAGE-0"]
+        assert "X-Next-Cursor" not in last.headers
+
+        projected = client.get("/api/diagnostics/?fields=identifier,result&limit=1", headers=token_headers)
+        assert projected.json() == [{"id": projected.json()[0]["id"], "identifier": "PAGE-0", "result": "Positive"}]
+
+        assert client.get("/api/diagnostics/?result=Negative", headers=token_headers).json() == []
+        assert client.get("/api/diagnostics/?fields=password", headers=token_headers).status_code == 400
+
+    def test_export_streams_csv_ndjson_and_gzip(self, client, token_headers, db_session):
+        """
+        Test that the export returns every row in each format with one audit event.
+        """
+        import csv
+        import gzip
+        import io
+        import json
+        from app.models.audit import AuditLog
+
+        rows = [
+            {"identifier": f"EXP-{i}", "protein1": 1.0, "protein2": 2.0, "protein3": 3.0}
+            for i in range(3)
+        ]
+        client.post("/api/diagnostics/batch", json=rows, headers=token_headers)
+
+        response = client.get("/api/diagnostics/export", headers=token_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        records = list(csv.DictReader(io.StringIO(response.text)))
+        assert [r["identifier"] for r in records] == ["EXP-0", "EXP-1", "EXP-2"]
+
+        response = client.get("/api/diagnostics/export?format=ndjson&compress=true", headers=token_headers)
+        lines = gzip.decompress(response.content).decode().splitlines()
+        assert [json.loads(line)["identifier"] for line in lines] == ["EXP-0", "EXP-1", "EXP-2"]
+
+        events = db_session.query(AuditLog).filter(AuditLog.action == "export_diagnostics").all()
+        assert len(events) == 2
+
+    def test_date_filters_include_boundary_rows(self, client, token_headers, db_session):
+        """
+        Test that rows stored exactly on a start/end boundary match in any stored text form.
+        """
+        from app.database import normalize_sqlite_timestamps
+
+        rows = [
+            {"identifier": f"EDGE-{i}", "protein1": 1.0, "protein2": 2.0, "protein3": 3.0}
+            for i in range(3)
+        ]
+        client.post("/api/diagnostics/batch", json=rows, headers=token_headers)
+        # Same instant in the forms other writers produce: ISO 'T', CURRENT_TIMESTAMP and canonical
+        for identifier, stored in (
+            ("EDGE-0", "2024-01-01T05:00:00"),
+            ("EDGE-1", "2024-01-01 05:00:00"),
+            ("EDGE-2", "2024-01-01 05:00:00.000000"),
+        ):
+            db_session.execute(
+                text("UPDATE diagnostics SET timestamp = :stored WHERE identifier = :identifier"),
+                {"stored": stored, "identifier": identifier}
+            )
+        normalize_sqlite_timestamps(db_session.connection(), "diagnostics")
+        db_session.commit()
+
+        for params in (
+            "start_date=2024-01-01T05:00:00",
+            "end_date=2024-01-01T05:00:00",
+            "start_date=2024-01-01T07:00:00%2B02:00&end_date=2024-01-01T07:00:00%2B02:00",
+        ):
+            response = client.get(f"/api/diagnostics/?{params}", headers=token_headers)
+            assert [d["identifier"] for d in response.json()] == ["EDGE-0", "EDGE-1", "EDGE-2"], params
+            assert all(d["timestamp"] == "2024-01-01T05:00:00" for d in response.json())
+
+        response = client.get("/api/diagnostics/export?start_date=2024-01-01T05:00:00", headers=token_headers)
+        assert response.text.count("EDGE-") == 3
@@ -138,4 +138,292 @@ class TestAuditLoggingIntegration:
         assert filter_response.status_code == 200
         filtered_data = filter_response.json()
         assert len(filtered_data["items"]) >= 1
-        assert all(log["action"] == "test_action" for log in filtered_data["items"])
\ No newline at end of file
+        assert all(log["action"] == "test_action" for log in filtered_data["items"])
+
+    def test_middleware_reuses_authenticated_principal(self, client, admin_user, monkeypatch):
+        """Test that the middleware records the user resolved by get_current_user"""
+        from app.services.audit_service import AuditService
+        from app.middleware import audit_middleware
+
+        # Record every check-access poll for this test
+        monkeypatch.setitem(audit_middleware.ROUTE_SAMPLE_RATES, "/api/admin/check-access", 1.0)
+
+        # Capture the events the middleware hands to the audit service
+        recorded = []
+
+        async def fake_log_event(self, **kwargs):
+            recorded.append(kwargs)
+
+        login_response = client.post(
+            "/api/auth/login",
+            data={"username": "adminuser", "password": "admin123"}
+        )
+        admin_headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        monkeypatch.setattr(AuditService, "log_event", fake_log_event)
+
+        response = client.get("/api/admin/check-access", headers=admin_headers)
+
+        assert response.status_code == 200
+        # A single enriched event per request
+        assert len(recorded) == 1
+        event = recorded[0]
+        assert event["user_id"] == 1
+        assert event["action"] == "get_check-access"
+        assert event["details"]["username"] == "adminuser"
+        assert event["details"]["status_code"] == 200
+        assert event["details"]["route"] == "/api/admin/check-access"
+        assert "latency_ms" in event["details"]
+
+    def test_middleware_samples_reads_but_keeps_failures(self, client, token_headers, monkeypatch):
+        """Test that sampled routes still record every failed request"""
+        from app.services.audit_service import AuditService
+        from app.middleware import audit_middleware
+
+        # Never record successful check-access polls
+        monkeypatch.setitem(audit_middleware.ROUTE_SAMPLE_RATES, "/api/admin/check-access", 0.0)
+
+        recorded = []
+
+        async def fake_log_event(self, **kwargs):
+            recorded.append(kwargs)
+
+        monkeypatch.setattr(AuditService, "log_event", fake_log_event)
+
+        # A regular user is rejected from the admin check, which is a failure
+        response = client.get("/api/admin/check-access", headers=token_headers)
+
+        assert response.status_code == 403
+        assert len(recorded) == 1
+        assert recorded[0]["details"]["status_code"] == 403
+        assert audit_middleware.sample_rate_for("GET", "/api/admin/check-access", 200) == 0.0
+        assert audit_middleware.sample_rate_for("POST", "/api/admin/check-access", 200) == 1.0
+
+    def test_admin_audit_log_keyset_pagination(self, client, db_session, admin_user):
+        """Test that following next_cursor walks every log exactly once"""
+        login_response = client.post(
+            "/api/auth/login",
+            data={"username": "adminuser", "password": "admin123"}
+        )
+        admin_headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+        # Several logs share a timestamp so the id tie-breaker matters
+        now = datetime.now()
+        for i in range(7):
+            db_session.add(AuditLog(
+                user_id=1,
+                action="keyset_action",
+                entity_type="test",
+                entity_id=str(i),
+                timestamp=now - timedelta(minutes=i // 2)
+            ))
+        db_session.commit()
+
+        seen = []
+        cursor = None
+        while True:
+            params = {"action": "keyset_action", "limit": 3}
+            if cursor:
+                params["after"] = cursor
+            response = client.get("/api/admin/audit-logs", params=params, headers=admin_headers)
+            assert response.status_code == 200
+            data = response.json()
+            seen.extend(log["entity_id"] for log in data["items"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+
+        # Newest first, no duplicates or gaps across pages
+        assert seen == ["1", "0", "3", "2", "5", "4", "6"]
+
+        bad_cursor = client.get("/api/admin/audit-logs?after=nonsense", headers=admin_headers)
+        assert bad_cursor.status_code == 400
+
+    def test_admin_audit_log_total_is_capped_unless_exact(self, client, db_session, admin_user, monkeypatch):
+        """Test the bounded total and the exact_total opt-in"""
+        from app.routers import admin
+
+        monkeypatch.setattr(admin, "AUDIT_COUNT_LIMIT", 3)
+
+        login_response = client.post(
+            "/api/auth/login",
+            data={"username": "adminuser", "password": "admin123"}
+        )
+        admin_headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+        for i in range(5):
+            db_session.add(AuditLog(user_id=1, action="count_action", entity_type="test", entity_id=str(i)))
+        db_session.commit()
+
+        capped = client.get("/api/admin/audit-logs?action=count_action&limit=2", headers=admin_headers).json()
+        assert capped["total"] == 3
+        assert capped["total_capped"] is True
+
+        exact = client.get(
+            "/api/admin/audit-logs?action=count_action&limit=2&exact_total=true",
+            headers=admin_headers
+        ).json()
+        assert exact["total"] == 5
+        assert exact["total_capped"] is False
+        assert exact["pages"] == 3
+
+        # start_date alone defaults end_date to now; the cache keys on the filters as given
+        admin._exact_count_cache.clear()
+        for _ in range(2):
+            client.get(
+                "/api/admin/audit-logs?action=count_action&start_date=2000-01-01T00:00:00&exact_total=true",
+                headers=admin_headers
+            )
+        assert list(admin._exact_count_cache) == [
+            (None, "count_action", None, None, datetime(2000, 1, 1), None)
+        ]
+
+    def test_admin_search_merges_live_and_archived_logs(self, client, db_session, admin_user, tmp_path, monkeypatch):
+        """Test that the search endpoint streams live and archived logs in timestamp order"""
+        from app.services import audit_service
+        from app.services.audit_archive import ColumnarArchiveWriter
+
+        monkeypatch.setattr(audit_service, "AUDIT_ARCHIVE_DIR", str(tmp_path))
+
+        login_response = client.post(
+            "/api/auth/login",
+            data={"username": "adminuser", "password": "admin123"}
+        )
+        admin_headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+        now = datetime.now()
+        # Two archived rows from last year
+        writer = ColumnarArchiveWriter(str(tmp_path))
+        for log_id, days_ago in ((1001, 400), (1002, 300)):
+            writer.writerow({
+                "id": log_id, "user_id": 1, "action": "search_action", "entity_type": "test",
+                "entity_id": str(log_id), "timestamp": now - timedelta(days=days_ago),
+                "details": None, "ip_address": None, "user_agent": None
+            })
+        writer.close()
+
+        # One live row
+        db_session.add(AuditLog(user_id=1, action="search_action", entity_type="test", entity_id="live", timestamp=now))
+        db_session.commit()
+
+        response = client.get("/api/admin/audit-logs/search?action=search_action", headers=admin_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["entity_id"] for row in rows] == ["live", "1002", "1001"]
+
+        # The date range prunes the older archive partition
+        start = (now - timedelta(days=350)).isoformat()
+        response = client.get(
+            "/api/admin/audit-logs/search",
+            params={"action": "search_action", "start_date": start},
+            headers=admin_headers
+        )
+        assert [json.loads(line)["entity_id"] for line in response.text.splitlines()] == ["live", "1002"]
+
+        live_only = client.get(
+            "/api/admin/audit-logs/search?action=search_action&include_archived=false",
+            headers=admin_headers
+        )
+        assert [json.loads(line)["entity_id"] for line in live_only.text.splitlines()] == ["live"]
+
+    def test_admin_search_accepts_offset_start_date(self, client, admin_user, tmp_path, monkeypatch):
+        """Test that Z and +02:00 start dates are compared with archived rows in UTC"""
+        from app.services import audit_service
+        from app.services.audit_archive import ColumnarArchiveWriter
+
+        monkeypatch.setattr(audit_service, "AUDIT_ARCHIVE_DIR", str(tmp_path))
+
+        login_response = client.post(
+            "/api/auth/login",
+            data={"username": "adminuser", "password": "admin123"}
+        )
+        admin_headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+        writer = ColumnarArchiveWriter(str(tmp_path))
+        for log_id, timestamp in ((2001, datetime(2025, 2, 28, 23, 0)), (2002, datetime(2025, 3, 1, 1, 0))):
+            writer.writerow({
+                "id": log_id, "user_id": 1, "action": "offset_action", "entity_type": "test",
+                "entity_id": str(log_id), "timestamp": timestamp,
+                "details": None, "ip_address": None, "user_agent": None
+            })
+        writer.close()
+
+        def search(start_date):
+            response = client.get(
+                "/api/admin/audit-logs/search",
+                params={"action": "offset_action", "start_date": start_date, "include_archived": "true"},
+                headers=admin_headers
+            )
+            assert response.status_code == 200
+            return [json.loads(line)["entity_id"] for line in response.text.splitlines()]
+
+        assert search("2025-03-01T00:00:00Z") == ["2002"]
+        # 00:30+02:00 is 22:30 UTC on the previous day, whose partition must not be pruned
+        assert search("2025-03-01T00:30:00+02:00") == ["2002", "2001"]
+
+    def test_admin_audit_logs_include_user_without_n_plus_one(self, client, db_session, admin_user):
+        """Test that include_user adds usernames without a users query per row"""
+        from sqlalchemy import event
+
+        login_response = client.post(
+            "/api/auth/login",
+            data={"username": "adminuser", "password": "admin123"}
+        )
+        admin_headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        for i in range(5):
+            db_session.add(AuditLog(user_id=1, action="include_user_action", entity_type="test"))
+        db_session.commit()
+        db_session.expunge_all()
+
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db_session.get_bind(), "before_cursor_execute", record)
+        try:
+            response = client.get(
+                "/api/admin/audit-logs?action=include_user_action&include_user=true",
+                headers=admin_headers
+            )
+        finally:
+            event.remove(db_session.get_bind(), "before_cursor_execute", record)
+
+        assert response.status_code == 200
+        assert [item["username"] for item in response.json()["items"]] == ["adminuser"] * 5
+        # Only the joined page query touches users (plus the auth lookup, if not cached)
+        user_lookups = [s for s in statements if "FROM users" in s and "audit_logs" not in s]
+        assert len(user_lookups) <= 1
+
+    @pytest.mark.parametrize("fast", [False, True])
+    def test_admin_audit_logs_read_monthly_partitions(self, client, db_session, admin_user, monkeypatch, fast):
+        """Test that the browser pages across sealed months, with and without the fast path"""
+        from app.routers import admin
+        from app.services.audit_partitions import seal_closed_months
+
+        monkeypatch.setattr(admin, "FAST_SERIALIZATION", fast)
+        login_response = client.post(
+            "/api/auth/login",
+            data={"username": "adminuser", "password": "admin123"}
+        )
+        admin_headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        now = datetime.utcnow()
+        for days in (70, 40, 0):
+            db_session.add(AuditLog(user_id=1, action="partitioned_action", entity_type="test",
+                                    entity_id=str(days), timestamp=now - timedelta(days=days)))
+        db_session.commit()
+        seal_closed_months(db_session.get_bind())
+
+        seen = []
+        url = "/api/admin/audit-logs?action=partitioned_action&limit=1&include_user=true"
+        response = client.get(url, headers=admin_headers).json()
+        while True:
+            seen += [(item["entity_id"], item["username"]) for item in response["items"]]
+            if not response["next_cursor"]:
+                break
+            response = client.get(f"{url}&after={response['next_cursor']}", headers=admin_headers).json()
+
+        assert seen == [("0", "adminuser"), ("40", "adminuser"), ("70", "adminuser")]
+        recent = client.get(
+            f"/api/admin/audit-logs?action=partitioned_action&start_date={(now - timedelta(days=1)).isoformat()}",
+            headers=admin_headers
+        ).json()
+        assert [item["entity_id"] for item in recent["items"]] == ["0"]
@@ -0,0 +1,122 @@
+import pytest
+from datetime import datetime, timedelta
+from app.services.audit_archive import ColumnarArchiveWriter, ColumnarArchiveReader
+
+def make_row(log_id, timestamp, action="create", user_id=1, entity_type="diagnostic"):
+    return {
+        "id": log_id,
+        "user_id": user_id,
+        "action": action,
+        "entity_type": entity_type,
+        "entity_id": str(log_id),
+        "timestamp": timestamp,
+        "details": '{"index": %d}' % log_id,
+        "ip_address": "127.0.0.1",
+        "user_agent": "pytest",
+    }
+
+class TestColumnarArchive:
+
+    @pytest.fixture
+    def archive_dir(self, tmp_path):
+        """Archive with rows spread over three days"""
+        base = datetime(2025, 3, 10, 12, 0, 0)
+        writer = ColumnarArchiveWriter(str(tmp_path))
+        for i in range(1, 10):
+            writer.writerow(make_row(
+                i,
+                base + timedelta(days=(i - 1) // 3, minutes=i),
+                action="login_success" if i % 3 == 0 else "create",
+                user_id=2 if i == 5 else 1
+            ))
+        writer.close()
+        return str(tmp_path)
+
+    def test_rows_are_partitioned_by_day(self, archive_dir):
+        """Test that the manifest lists one partition per day"""
+        reader = ColumnarArchiveReader(archive_dir)
+
+        assert reader.partitions() == ["2025-03-10", "2025-03-11", "2025-03-12"]
+        segment = reader.manifest["partitions"]["2025-03-11"][0]
+        assert segment["rows"] == 3
+        assert segment["min_id"] == 4 and segment["max_id"] == 6
+        assert segment["user_ids"] == [1, 2]
+
+    def test_get_logs_matches_audit_service_filters(self, archive_dir):
+        """Test filtering, ordering and pagination over archived rows"""
+        reader = ColumnarArchiveReader(archive_dir)
+
+        newest_first = reader.get_logs()
+        assert [row["id"] for row in newest_first] == [9, 8, 7, 6, 5, 4, 3, 2, 1]
+        assert newest_first[0]["timestamp"] == datetime(2025, 3, 12, 12, 9)
+        assert newest_first[0]["details"] == '{"index": 9}'
+
+        assert [row["id"] for row in reader.get_logs(action="login_success")] == [9, 6, 3]
+        assert [row["id"] for row in reader.get_logs(user_id=2)] == [5]
+        assert [row["id"] for row in reader.get_logs(limit=2, offset=3)] == [6, 5]
+
+        in_range = reader.get_logs(
+            start_date=datetime(2025, 3, 11, 0, 0),
+            end_date=datetime(2025, 3, 11, 12, 5)
+        )
+        assert [row["id"] for row in in_range] == [5, 4]
+
+    def test_segments_are_streamed_in_order(self, archive_dir, tmp_path):
+        """Test that ordered segments stream both ways and unordered ones are still sorted"""
+        reader = ColumnarArchiveReader(archive_dir)
+        assert all(entry["sorted"] for entries in reader.manifest["partitions"].values() for entry in entries)
+        assert [row["id"] for row in reader.iter_logs(descending=False)] == list(range(1, 10))
+        assert [row["id"] for row in reader.iter_logs()] == list(range(9, 0, -1))
+
+        unordered_dir = str(tmp_path / "unordered")
+        writer = ColumnarArchiveWriter(unordered_dir)
+        for log_id, minute in ((1, 5), (2, 1), (3, 3)):
+            writer.writerow(make_row(log_id, datetime(2025, 3, 10, 12, minute)))
+        writer.close()
+
+        reader = ColumnarArchiveReader(unordered_dir)
+        assert reader.manifest["partitions"]["2025-03-10"][0]["sorted"] is False
+        assert [row["id"] for row in reader.get_logs()] == [1, 3, 2]
+
+    def test_partitions_outside_range_are_not_opened(self, archive_dir, monkeypatch):
+        """Test that date ranges and manifest stats prune segments"""
+        reader = ColumnarArchiveReader(archive_dir)
+        scanned = []
+        original_scan = reader._scan_segment
+
+        def tracking_scan(entry, *args):
+            scanned.append(entry["path"].split("/")[0])
+            return original_scan(entry, *args)
+
+        monkeypatch.setattr(reader, "_scan_segment", tracking_scan)
+
+        reader.get_logs(start_date=datetime(2025, 3, 12))
+        reader.get_logs(user_id=2)
+
+        assert scanned == ["2025-03-12", "2025-03-11"]
+
+    def test_rows_written_after_last_flush_are_ignored(self, tmp_path):
+        """Test that a writer interrupted after flush only exposes synced rows"""
+        writer = ColumnarArchiveWriter(str(tmp_path))
+        writer.writerow(make_row(1, datetime(2025, 3, 10, 12, 0)))
+        writer.flush()
+        # Simulate a crash: more rows written but never flushed or closed
+        writer.writerow(make_row(2, datetime(2025, 3, 10, 12, 1)))
+
+        reader = ColumnarArchiveReader(str(tmp_path))
+
+        assert [row["id"] for row in reader.get_logs()] == [1]
+
+    def test_drop_partitions_before_removes_whole_days(self, archive_dir):
+        """Test that retention drops expired partitions and their files"""
+        import os
+        from datetime import date
+        from app.services.audit_archive import drop_partitions_before
+
+        dropped = drop_partitions_before(archive_dir, date(2025, 3, 12))
+
+        reader = ColumnarArchiveReader(archive_dir)
+        assert dropped == 6
+        assert reader.partitions() == ["2025-03-12"]
+        assert not os.path.exists(os.path.join(archive_dir, "2025-03-10"))
+        assert [row["id"] for row in reader.get_logs()] == [9, 8, 7]
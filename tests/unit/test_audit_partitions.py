@@ -0,0 +1,112 @@
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine, event, inspect, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.audit import AuditLog
+from app.services.audit_partitions import (
+    delete_logs_before, drop_partitions_before, partition_table, partitions_in_range, seal_closed_months
+)
+from app.services.audit_service import AuditService
+
+NOW = datetime(2025, 3, 15, 12, 0)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'partitions.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(AuditLog), [
+            {"id": 1, "action": "january", "entity_type": "test", "timestamp": datetime(2025, 1, 10)},
+            {"id": 2, "action": "january", "entity_type": "test", "timestamp": datetime(2025, 1, 31, 23, 59)},
+            {"id": 3, "action": "february", "entity_type": "test", "timestamp": datetime(2025, 2, 1)},
+            {"id": 4, "action": "march", "entity_type": "test", "timestamp": datetime(2025, 3, 1)},
+            {"id": 5, "action": "march", "entity_type": "test", "timestamp": datetime(2025, 3, 14)},
+        ])
+    yield engine
+    engine.dispose()
+
+
+def table_names(engine):
+    return sorted(name for name in inspect(engine).get_table_names() if name.startswith("audit_logs"))
+
+
+class TestAuditPartitions:
+
+    def test_seal_moves_closed_months_into_partitions(self, engine):
+        """Test that closed months move to their own tables, keeping ids"""
+        assert seal_closed_months(engine, now=NOW, chunk_size=2) == 3
+
+        assert table_names(engine) == ["audit_logs", "audit_logs_2025_01", "audit_logs_2025_02"]
+        with engine.connect() as conn:
+            assert conn.scalars(select(AuditLog.id).order_by(AuditLog.id)).all() == [4, 5]
+            assert conn.scalars(select(partition_table("audit_logs_2025_01").c.id)).all() == [1, 2]
+        # Nothing left to move
+        assert seal_closed_months(engine, now=NOW) == 0
+
+    def test_newest_row_stays_live(self, engine):
+        """Test that the row with the highest id is never moved, so ids keep increasing"""
+        seal_closed_months(engine, now=datetime(2025, 6, 1))
+
+        with engine.connect() as conn:
+            assert conn.scalars(select(AuditLog.id)).all() == [5]
+
+    @pytest.mark.asyncio
+    async def test_date_range_reads_only_overlapping_partitions(self, engine):
+        """Test that get_logs and iter_logs skip partitions outside the range"""
+        seal_closed_months(engine, now=NOW)
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+        db = sessionmaker(bind=engine)()
+
+        logs = await AuditService(db).get_logs(start_date=datetime(2025, 2, 1), end_date=datetime(2025, 2, 28))
+        assert [log.id for log in logs] == [3]
+        assert not any("audit_logs_2025_01" in statement for statement in statements)
+
+        statements.clear()
+        rows = list(AuditService(db).iter_logs(start_date=datetime(2025, 1, 31)))
+        assert [row["id"] for row in rows] == [5, 4, 3, 2]
+        assert any("audit_logs_2025_01" in statement for statement in statements)
+
+        assert [log.id for log in await AuditService(db).get_logs()] == [5, 4, 3, 2, 1]
+        db.close()
+
+    def test_partitions_in_range_bounds(self, engine):
+        """Test month overlap at the edges of the range"""
+        seal_closed_months(engine, now=NOW)
+        with engine.connect() as conn:
+            assert partitions_in_range(conn, end_date=datetime(2025, 1, 31)) == ["audit_logs_2025_01"]
+            assert partitions_in_range(conn, start_date=datetime(2025, 2, 1)) == ["audit_logs_2025_02"]
+            assert partitions_in_range(conn, start_date=datetime(2025, 3, 1)) == []
+
+    def test_drop_partitions_before_drops_whole_months(self, engine):
+        """Test that retention removes only months that ended before the cutoff"""
+        seal_closed_months(engine, now=NOW)
+
+        assert drop_partitions_before(engine, datetime(2025, 2, 20)) == 2
+
+        assert table_names(engine) == ["audit_logs", "audit_logs_2025_02"]
+
+    def test_delete_logs_before_trims_the_cutoff_month(self, engine):
+        """Test that rows older than the cutoff go from the partly expired month and audit_logs"""
+        seal_closed_months(engine, now=NOW)
+        drop_partitions_before(engine, datetime(2025, 3, 10))
+
+        assert delete_logs_before(engine, datetime(2025, 3, 10), chunk_size=1) == 1
+
+        with engine.connect() as conn:
+            assert conn.scalars(select(AuditLog.id)).all() == [5]
+
+    def test_delete_logs_before_keeps_newest_row(self, engine):
+        """Test that the newest row survives even when it is older than the cutoff"""
+        seal_closed_months(engine, now=NOW)
+        drop_partitions_before(engine, datetime(2025, 2, 20))
+
+        assert delete_logs_before(engine, datetime(2025, 6, 1)) == 2
+
+        assert table_names(engine) == ["audit_logs", "audit_logs_2025_02"]
+        with engine.connect() as conn:
+            assert conn.scalars(select(AuditLog.id)).all() == [5]
+            assert conn.scalars(select(partition_table("audit_logs_2025_02").c.id)).all() == []
@@ -229,4 +229,25 @@ class TestAuditService:
         # Assert
         assert deleted_count >= 1  # Should have deleted at least the old log
         assert all(log.action != "delete_me" for log in remaining_logs)
-        assert any(log.action == "keep_me" for log in remaining_logs)
\ No newline at end of file
+        assert any(log.action == "keep_me" for log in remaining_logs)
+
+    @pytest.mark.asyncio
+    async def test_delete_logs_drops_expired_monthly_partitions(self, db_session):
+        """Test that retention seals closed months and drops the expired ones whole"""
+        from sqlalchemy import inspect
+        from app.services.audit_partitions import month_start, partition_name
+
+        audit_service = AuditService(db_session)
+        now = datetime.utcnow()
+        old = now - timedelta(days=90)
+        for i in range(7):
+            db_session.add(AuditLog(action="expired", entity_type="test", timestamp=old))
+        db_session.add(AuditLog(action="fresh", entity_type="test", timestamp=now))
+        db_session.commit()
+
+        deleted_count = await audit_service.delete_old_logs(days=30)
+
+        assert deleted_count == 7
+        assert partition_name(month_start(old)) not in inspect(db_session.get_bind()).get_table_names()
+        remaining = await audit_service.get_logs(start_date=old - timedelta(days=1))
+        assert [log.action for log in remaining] == ["fresh"]
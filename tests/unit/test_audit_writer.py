@@ -0,0 +1,67 @@
+import pytest
+from app.services.audit_service import AuditService
+from app.services.audit_writer import audit_writer
+from app.models.audit import AuditLog
+
+class TestAuditWriter:
+
+    @pytest.mark.asyncio
+    async def test_queued_events_are_written_on_stop(self, db_session):
+        """Test that batched events are persisted when the writer drains"""
+        # Arrange
+        audit_service = AuditService(db_session)
+        await audit_writer.start()
+
+        try:
+            # Act
+            for i in range(5):
+                log_entry = await audit_service.log_event(
+                    action="batched_action",
+                    entity_type="test",
+                    entity_id=str(i),
+                    user_id=1,
+                    details={"index": i}
+                )
+                # Queued entries are not persisted yet
+                assert log_entry.id is None
+                assert log_entry.timestamp is not None
+        finally:
+            await audit_writer.stop()
+
+        # Assert - everything was written after the drain
+        logs = db_session.query(AuditLog).filter(AuditLog.action == "batched_action").all()
+        assert len(logs) == 5
+        assert sorted(log.entity_id for log in logs) == ["0", "1", "2", "3", "4"]
+
+    @pytest.mark.asyncio
+    async def test_sync_actions_bypass_queue(self, db_session):
+        """Test that events configured as synchronous are committed immediately"""
+        # Arrange
+        audit_service = AuditService(db_session)
+        await audit_writer.start()
+
+        try:
+            # Act
+            log_entry = await audit_service.log_event(
+                action="login_failed",
+                entity_type="user",
+                entity_id="someone",
+                details={"reason": "invalid_credentials"}
+            )
+
+            # Assert - committed before the writer flushed anything
+            assert log_entry.id is not None
+            db_entry = db_session.query(AuditLog).filter(AuditLog.id == log_entry.id).first()
+            assert db_entry is not None
+        finally:
+            await audit_writer.stop()
+
+    @pytest.mark.asyncio
+    async def test_log_event_writes_inline_when_writer_stopped(self, db_session):
+        """Test that log_event falls back to inline writes without a running writer"""
+        audit_service = AuditService(db_session)
+
+        log_entry = await audit_service.log_event(action="inline_action", entity_type="test")
+
+        assert not audit_writer.running
+        assert log_entry.id is not None
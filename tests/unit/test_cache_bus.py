@@ -0,0 +1,118 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, func, insert, select, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.cache_invalidation import CacheInvalidation
+from app.models.setting import AppSetting
+from app.models.user import User
+from app.services.bootstrap import TIMESTAMPS_NORMALIZED_KEY, create_default_admin, initialize_database
+from app.services.cache_bus import CacheBus
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bus.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def test_other_workers_apply_published_invalidations(engine):
+    session_factory = sessionmaker(bind=engine)
+    publisher = CacheBus(session_factory)
+    subscriber = CacheBus(session_factory)
+    seen = []
+    publisher.subscribe("principal", lambda key: seen.append(("publisher", key)))
+    subscriber.subscribe("principal", lambda key: seen.append(("subscriber", key)))
+
+    publisher.publish_sync("principal", "alice")
+    publisher.publish_sync("principal")
+
+    assert subscriber.poll() == 2
+    assert seen == [("subscriber", "alice"), ("subscriber", None)]
+    # The publisher skips its own messages and nothing is delivered twice
+    assert publisher.poll() == 2
+    assert subscriber.poll() == 0
+    assert seen == [("subscriber", "alice"), ("subscriber", None)]
+
+
+def test_messages_committed_out_of_id_order_are_delivered(engine):
+    """A lower id that becomes visible after a higher one must not be skipped"""
+    session_factory = sessionmaker(bind=engine)
+    bus = CacheBus(session_factory)
+    seen = []
+    bus.subscribe("principal", seen.append)
+    now = datetime.utcnow()
+
+    # id 2 commits first, id 1 (inserted slightly earlier) commits later
+    with engine.begin() as conn:
+        conn.execute(insert(CacheInvalidation).values(id=2, cache="principal", key="bob", created_at=now))
+    assert bus.poll() == 1
+    with engine.begin() as conn:
+        conn.execute(insert(CacheInvalidation).values(
+            id=1, cache="principal", key="alice", created_at=now - timedelta(seconds=1)
+        ))
+
+    assert bus.poll() == 1
+    assert seen == ["bob", "alice"]
+    assert bus.poll() == 0
+
+
+@pytest.mark.asyncio
+async def test_start_skips_existing_messages(engine):
+    session_factory = sessionmaker(bind=engine)
+    CacheBus(session_factory).publish_sync("principal", "alice")
+    bus = CacheBus(session_factory, poll_interval=3600)
+    seen = []
+    bus.subscribe("principal", seen.append)
+
+    await bus.start()
+    await bus.stop()
+    CacheBus(session_factory).publish_sync("principal", "bob")
+
+    assert bus.poll() == 1
+    assert seen == ["bob"]
+
+
+def test_failing_handler_does_not_stop_delivery(engine):
+    session_factory = sessionmaker(bind=engine)
+    bus = CacheBus(session_factory)
+    seen = []
+    bus.subscribe("scoring", lambda key: 1 / 0)
+    bus.subscribe("scoring", lambda key: seen.append(key))
+
+    CacheBus(session_factory).publish_sync("scoring")
+    bus.poll()
+
+    assert seen == [None]
+
+
+def test_startup_initialization_is_idempotent(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'init.db'}", connect_args={"check_same_thread": False})
+    initialize_database(engine)
+    initialize_database(engine)
+
+    assert create_default_admin(engine) is True
+    assert create_default_admin(engine) is False
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(User)) == 1
+        assert conn.scalar(select(func.count()).select_from(CacheInvalidation)) == 0
+    engine.dispose()
+
+
+def test_timestamp_normalization_runs_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'normalize.db'}", connect_args={"check_same_thread": False})
+    initialize_database(engine)
+    with engine.begin() as conn:
+        assert conn.scalar(select(AppSetting.value).where(AppSetting.key == TIMESTAMPS_NORMALIZED_KEY)) == "1"
+        conn.execute(text(
+            "INSERT INTO audit_logs (action, entity_type, timestamp) VALUES ('late', 'test', '2024-01-01T05:00:00')"
+        ))
+
+    # Later startups leave the tables alone
+    initialize_database(engine)
+    with engine.connect() as conn:
+        assert conn.scalar(text("SELECT timestamp FROM audit_logs WHERE action = 'late'")) == "2024-01-01T05:00:00"
+    engine.dispose()
@@ -0,0 +1,97 @@
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from app.middleware.metrics_middleware import MetricsMiddleware
+from app.services.metrics import end_request, instrument_engine, metrics_registry, start_request, timed
+
+class TestMetrics:
+    def make_app(self):
+        engine = create_engine("sqlite://")
+        instrument_engine(engine)
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/items/{item_id}")
+        async def read_item(item_id: int):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                conn.execute(text("SELECT 2"))
+            with timed("audit"):
+                await asyncio.sleep(0)
+            return {"id": item_id}
+
+        return app
+
+    def test_server_timing_and_route_metrics(self):
+        """Test that SQL and audit time are reported per request and per route"""
+        metrics_registry.reset()
+        client = TestClient(self.make_app())
+
+        response = client.get("/items/1")
+        client.get("/items/2")
+
+        timing = response.headers["server-timing"]
+        assert timing.startswith("app;dur=")
+        assert 'desc="2 queries"' in timing
+        assert "audit;dur=" in timing
+
+        text_format = metrics_registry.render()
+        series = '{method="GET",route="/items/{item_id}",status="200"}'
+        assert f"womsoft_request_duration_seconds_count{series} 2" in text_format
+        assert f"womsoft_sql_statements_total{series} 4" in text_format
+        metrics_registry.reset()
+
+    def test_metrics_endpoint_requires_token(self, monkeypatch):
+        """Test that /metrics is refused without the configured scrape token"""
+        from app.routers import metrics as metrics_router
+
+        app = FastAPI()
+        app.include_router(metrics_router.router)
+        client = TestClient(app)
+
+        monkeypatch.setattr(metrics_router, "METRICS_TOKEN", "")
+        assert client.get("/metrics", headers={"Authorization": "Bearer "}).status_code == 403
+
+        monkeypatch.setattr(metrics_router, "METRICS_TOKEN", "scrape-secret")
+        assert client.get("/metrics").status_code == 401
+        assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+        response = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+        assert response.status_code == 200
+        assert "womsoft_principal_cache_size" in response.text
+
+    def test_timed_is_noop_outside_requests(self):
+        """Test that timing code outside a request records nothing"""
+        metrics_registry.reset()
+        before = metrics_registry.render()
+        engine = create_engine("sqlite://")
+        instrument_engine(engine)
+        # A record from a request that has already finished
+        timings, token = start_request()
+        end_request(token)
+
+        with timed("audit"):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+
+        assert timings == {"sql_count": 0, "sql": 0.0, "audit": 0.0, "bcrypt": 0.0}
+        assert metrics_registry.render() == before
+        assert "route=" not in metrics_registry.render()
+
+    def test_failed_statements_are_timed(self):
+        """Test that a statement that raises is counted and leaves no start time behind"""
+        engine = create_engine("sqlite://")
+        instrument_engine(engine)
+        timings, token = start_request()
+        try:
+            with engine.connect() as conn:
+                with pytest.raises(OperationalError):
+                    conn.execute(text("SELECT * FROM missing_table"))
+                conn.execute(text("SELECT 1"))
+                assert conn.info["query_start"] == []
+        finally:
+            end_request(token)
+
+        assert timings["sql_count"] == 2
@@ -0,0 +1,36 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from app.auth.password_pool import PasswordPool
+from app.auth.jwt import get_password_hash_async, verify_password_async
+
+class TestPasswordPool:
+
+    @pytest.mark.asyncio
+    async def test_hash_and_verify_run_off_the_event_loop(self):
+        """Test that the async helpers produce verifiable hashes"""
+        hashed = await get_password_hash_async("secret")
+
+        assert await verify_password_async("secret", hashed)
+        assert not await verify_password_async("wrong", hashed)
+
+    @pytest.mark.asyncio
+    async def test_saturated_pool_rejects_with_503(self):
+        """Test that calls beyond the pending limit fail fast"""
+        pool = PasswordPool(workers=1, max_pending=1)
+        release = threading.Event()
+
+        # Occupy the only slot with a call that blocks until released
+        busy = asyncio.create_task(pool.run(release.wait, 5))
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await pool.run(lambda: None)
+
+        release.set()
+        await busy
+
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.headers["Retry-After"] == "1"
+        assert pool.pending == 0
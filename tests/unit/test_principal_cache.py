@@ -0,0 +1,73 @@
+import time
+import pytest
+from app.auth.principal_cache import PrincipalCache
+
+class TestPrincipalCache:
+
+    def test_hit_and_miss_counters(self):
+        """Test that lookups are counted as hits or misses"""
+        cache = PrincipalCache(maxsize=10, ttl=60)
+
+        assert cache.get("alice") is None
+        cache.set("alice", {"id": 1, "username": "alice"})
+        assert cache.get("alice") == {"id": 1, "username": "alice"}
+
+        assert cache.stats() == {"size": 1, "hits": 1, "misses": 1}
+
+    def test_entries_expire_after_ttl(self):
+        """Test that entries older than the TTL are treated as misses"""
+        cache = PrincipalCache(maxsize=10, ttl=0.01)
+        cache.set("alice", {"id": 1})
+
+        time.sleep(0.02)
+
+        assert cache.get("alice") is None
+        assert cache.stats()["size"] == 0
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test that the cache stays within its size bound"""
+        cache = PrincipalCache(maxsize=2, ttl=60)
+        cache.set("alice", {"id": 1})
+        cache.set("bob", {"id": 2})
+
+        # Touch alice so bob becomes the eviction candidate
+        cache.get("alice")
+        cache.set("carol", {"id": 3})
+
+        assert cache.get("bob") is None
+        assert cache.get("alice") == {"id": 1}
+        assert cache.get("carol") == {"id": 3}
+
+    def test_invalidate_removes_entry(self):
+        """Test that invalidation forces the next lookup to miss"""
+        cache = PrincipalCache(maxsize=10, ttl=60)
+        cache.set("alice", {"id": 1})
+
+        cache.invalidate("alice")
+
+        assert cache.get("alice") is None
+
+    def test_authenticated_requests_use_cache(self, client, token_headers):
+        """Test that repeated authenticated calls are served from the cache"""
+        from app.auth.principal_cache import principal_cache
+
+        client.get("/api/diagnostics/", headers=token_headers)
+        hits_before = principal_cache.stats()["hits"]
+
+        response = client.get("/api/diagnostics/", headers=token_headers)
+
+        assert response.status_code == 200
+        assert principal_cache.stats()["hits"] == hits_before + 1
+
+    def test_cache_hits_resolve_to_read_only_principal(self, client, token_headers):
+        """Test that cached callers are Principals, not partial ORM users"""
+        import dataclasses
+        from app.auth.principal_cache import Principal, principal_cache
+
+        client.get("/api/diagnostics/", headers=token_headers)
+        principal = principal_cache.get("testuser")
+
+        assert isinstance(principal, Principal)
+        assert not hasattr(principal, "hashed_password")
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            principal.id = 2
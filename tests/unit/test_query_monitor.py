@@ -0,0 +1,45 @@
+import logging
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from app.services.query_monitor import (
+    end_request, monitor_engine, normalize_statement, report_repeats, start_request
+)
+
+class TestQueryMonitor:
+    def test_normalize_statement_collapses_in_lists(self):
+        """Test that statements differing only in IN list length compare equal"""
+        assert normalize_statement("SELECT *\n  FROM t WHERE id IN (?, ?, ?)") == "SELECT * FROM t WHERE id IN (?)"
+        assert normalize_statement("SELECT * FROM t WHERE id IN (?,?)") == "SELECT * FROM t WHERE id IN (?)"
+
+    def test_repeated_and_slow_statements_are_logged(self, caplog):
+        """Test the N+1 warning and the slow-query log with its route"""
+        engine = create_engine("sqlite://")
+        monitor_engine(engine, slow_query_ms=0.000001, track_repeats=True)
+        request = start_request({"type": "http", "method": "GET", "path": "/api/admin/audit-logs"})
+
+        with caplog.at_level(logging.WARNING, logger="app.sql"):
+            with engine.connect() as conn:
+                for user_id in range(5):
+                    conn.execute(text("SELECT :id AS user_id"), {"id": user_id})
+            end_request(request)
+            report_repeats(request, threshold=5)
+
+        messages = [record.getMessage() for record in caplog.records]
+        assert any(m.startswith("Slow query") and "GET /api/admin/audit-logs" in m and "params=" in m for m in messages)
+        assert any("Possible N+1 on GET /api/admin/audit-logs: statement ran 5 times" in m for m in messages)
+
+    def test_failed_statements_are_logged(self, caplog):
+        """Test that a slow statement that raises is logged and leaves no start time behind"""
+        engine = create_engine("sqlite://")
+        monitor_engine(engine, slow_query_ms=0.000001, track_repeats=False)
+
+        with caplog.at_level(logging.WARNING, logger="app.sql"):
+            with engine.connect() as conn:
+                for _ in range(3):
+                    with pytest.raises(OperationalError):
+                        conn.execute(text("SELECT * FROM missing_table"))
+                assert conn.info["query_monitor_start"] == []
+
+        messages = [record.getMessage() for record in caplog.records]
+        assert sum(m.startswith("Slow query") and "failed" in m and "missing_table" in m for m in messages) == 3
@@ -0,0 +1,84 @@
+import json
+import pytest
+from sqlalchemy.orm import sessionmaker
+from app.models.diagnostic import Diagnostic
+from app.models.setting import AppSetting
+from app.services.rescore import RescoreAlreadyRunning, RescoreJob, RESCORE_CHECKPOINT_KEY, RESCORE_LOCK_KEY
+from app.services.scoring import ScoringEngine
+
+class TestRescoreJob:
+    @pytest.fixture
+    def linear_engine(self, tmp_path):
+        """Positive when protein1 + protein2 + protein3 >= 3"""
+        path = tmp_path / "model.json"
+        path.write_text(json.dumps({"type": "linear", "weights": [1, 1, 1], "threshold": 3.0}))
+        engine = ScoringEngine(model_path=str(path))
+        engine.load()
+        return engine
+
+    @pytest.fixture
+    def diagnostics(self, db_session):
+        for i in range(10):
+            db_session.add(Diagnostic(
+                identifier=f"RS-{i}", protein1=float(i % 2) * 2, protein2=1.0, protein3=1.0, result="Positive"
+            ))
+        db_session.commit()
+
+    def test_rescore_updates_changed_rows_in_chunks(self, db_engine, db_session, diagnostics, linear_engine):
+        """Test that every row is re-scored and only changed rows count as changed"""
+        progress = []
+        job = RescoreJob(sessionmaker(bind=db_engine), engine=linear_engine, chunk_size=3, pause=0)
+
+        status = job.run(progress=lambda s: progress.append(s["processed"]))
+
+        assert status["state"] == "finished"
+        assert (status["processed"], status["changed"]) == (10, 5)
+        assert progress == [3, 6, 9, 10]
+        db_session.expire_all()
+        results = [d.result for d in db_session.query(Diagnostic).order_by(Diagnostic.id)]
+        assert results == ["Negative", "Positive"] * 5
+        assert db_session.get(AppSetting, RESCORE_CHECKPOINT_KEY) is None
+
+    def test_rescore_resumes_from_checkpoint(self, db_engine, db_session, diagnostics, linear_engine):
+        """Test that an interrupted run continues after its last committed chunk"""
+        last = db_session.query(Diagnostic).order_by(Diagnostic.id.desc()).first()
+        db_session.add(AppSetting(key=RESCORE_CHECKPOINT_KEY, value=json.dumps({
+            "last_id": last.id - 4, "max_id": last.id, "processed": 6, "changed": 3
+        })))
+        db_session.commit()
+        job = RescoreJob(sessionmaker(bind=db_engine), engine=linear_engine, chunk_size=3, pause=0)
+
+        status = job.run()
+
+        assert (status["processed"], status["changed"]) == (10, 5)
+        db_session.expire_all()
+        untouched = db_session.query(Diagnostic).filter(Diagnostic.id <= last.id - 4).all()
+        assert all(d.result == "Positive" for d in untouched)
+
+    def test_only_one_process_holds_the_rescore_lease(self, db_engine, db_session, diagnostics, linear_engine):
+        """Test that a second job, as in another worker, can't start while the lease is held"""
+        session_factory = sessionmaker(bind=db_engine)
+        holder = RescoreJob(session_factory, engine=linear_engine, pause=0)
+        other = RescoreJob(session_factory, engine=linear_engine, pause=0)
+        with session_factory() as db:
+            assert holder._claim(db)
+
+        with pytest.raises(RescoreAlreadyRunning):
+            other.run()
+        assert other.start() is False
+
+        # The holder runs and gives the lease back when done
+        assert holder.run()["state"] == "finished"
+        db_session.expire_all()
+        assert db_session.get(AppSetting, RESCORE_LOCK_KEY).value is None
+        assert other.run()["state"] == "finished"
+
+    def test_expired_rescore_lease_is_taken_over(self, db_engine, db_session, diagnostics, linear_engine):
+        """Test that a lease left behind by a crashed process stops blocking new runs"""
+        db_session.add(AppSetting(key=RESCORE_LOCK_KEY, value=json.dumps({
+            "owner": "crashed", "expires_at": "2000-01-01T00:00:00"
+        })))
+        db_session.commit()
+        job = RescoreJob(sessionmaker(bind=db_engine), engine=linear_engine, pause=0)
+
+        assert job.run()["state"] == "finished"
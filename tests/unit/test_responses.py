@@ -0,0 +1,24 @@
+import json
+from datetime import datetime
+from fastapi.encoders import jsonable_encoder
+from app.responses import FastJSONResponse
+from app.schemas.diagnostic import Diagnostic as DiagnosticSchema
+
+class TestFastJSONResponse:
+    def test_matches_response_model_encoding(self):
+        """Test that row dicts encode to the same JSON as the Pydantic path"""
+        row = {
+            "id": 7,
+            "identifier": "FAST-1",
+            "user_id": 2,
+            "protein1": 1.5,
+            "protein2": 2.0,
+            "protein3": 0.25,
+            "result": "Positive",
+            "timestamp": datetime(2025, 3, 10, 12, 0, 0, 123456)
+        }
+
+        fast = json.loads(FastJSONResponse(content=[row]).body)
+        model = jsonable_encoder([DiagnosticSchema(**row)])
+
+        assert fast == model
@@ -0,0 +1,49 @@
+import json
+import pytest
+from app.services.scoring import ScoringEngine
+
+class TestScoringEngine:
+    def test_default_model_scores_positive(self):
+        """Test that without a model file every sample is Positive"""
+        engine = ScoringEngine(model_path="")
+
+        assert engine.score([0.5, 5.5], [1.2, 0.0], [0.8, 10.2]) == ["Positive", "Positive"]
+        assert engine.score([], [], []) == []
+
+    def test_linear_model_scores_batch(self, tmp_path):
+        """Test that a linear model thresholds the weighted sum of each sample"""
+        path = tmp_path / "model.json"
+        path.write_text(json.dumps({"type": "linear", "weights": [1, 1, 1], "threshold": 3.0}))
+        engine = ScoringEngine(model_path=str(path))
+
+        assert engine.score([1.0, 0.5, 2.0], [1.0, 0.5, 2.0], [1.0, 0.5, 2.0]) == ["Positive", "Negative", "Positive"]
+        assert engine.score_one(0.0, 0.0, 0.0) == "Negative"
+
+    def test_reload_swaps_model_and_keeps_old_on_error(self, tmp_path):
+        """Test hot reload and that a broken file leaves the old model active"""
+        path = tmp_path / "model.json"
+        path.write_text(json.dumps({"type": "constant", "result": "Negative"}))
+        engine = ScoringEngine(model_path=str(path))
+        engine.load()
+        assert engine.score_one(1, 2, 3) == "Negative"
+
+        path.write_text(json.dumps({"type": "constant", "result": "Inconclusive"}))
+        engine.reload()
+        assert engine.score_one(1, 2, 3) == "Inconclusive"
+
+        path.write_text(json.dumps({"type": "no-such-model"}))
+        with pytest.raises(ValueError):
+            engine.reload()
+        assert engine.score_one(1, 2, 3) == "Inconclusive"
+
+    def test_model_class_must_implement_score(self, tmp_path):
+        """Test that an abstract model class is rejected and the old model stays"""
+        path = tmp_path / "model.json"
+        path.write_text(json.dumps({"class": "app.services.scoring:ScoringModel"}))
+        engine = ScoringEngine(model_path="")
+        engine.load()
+
+        engine.model_path = str(path)
+        with pytest.raises(TypeError):
+            engine.reload()
+        assert engine.score_one(1, 2, 3) == "Positive"